@@ -1,20 +1,25 @@
 # SPDX-FileCopyrightText: 2021 ladyada for Adafruit Industries
 # SPDX-License-Identifier: MIT
 
+# usage: python imu_simpletest.py [recording]
+#   recording: replay a data.txt / Xsens txt / blackbox log instead of reading the BNO055
+
+import os
+import sys
 import time
 import math
 import mathlib
-import board
-import adafruit_bno055
-
-if __name__ == '__main__':
-    i2c = board.I2C()
-    sensor = adafruit_bno055.BNO055_I2C(i2c)
 
-    # IMU Configuration
+# Device layer (Programs/devices.py)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Programs')))
+import devices
 
-    sensor.mode = adafruit_bno055.IMUPLUS_MODE
-    sensor.accel_range = adafruit_bno055.ACCEL_8G
+if __name__ == '__main__':
+    # IMU Configuration (IMUPLUS mode, 8G)
+    if(len(sys.argv) > 1):
+        sensor = devices.open_replay(sys.argv[1]).imu
+    else:
+        sensor = devices.open_imu(accel_range=8)
 
     frequency_intv = 1/10
     last_sample = time.monotonic()
@@ -27,7 +32,7 @@ if __name__ == '__main__':
     while(sensor.calibration_status[1] != 3 or sensor.calibration_status[2] != 3):
         pass
       
-    while True:
+    while not (hasattr(sensor, "finished") and sensor.finished()):
         this_sample = time.monotonic()
         if(this_sample - last_sample >= frequency_intv):
             last_sample = this_sample
@@ -1,17 +1,20 @@
+# usage: python pos_track_test.py [recording]
+#   recording: replay a data.txt / Xsens txt / blackbox log instead of reading the BNO055
+
+import os
+import sys
 import time
 import numpy as np
-import board
-import adafruit_bno055
 import scipy.integrate as it
 from scipy.spatial.transform import Rotation as R
 
+# Device layer (Programs/devices.py)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Programs')))
+import devices
+
 NOISE = 0.5
 SAMPLE_RATE = 100
-
-i2c = board.I2C()
-bno = adafruit_bno055.BNO055_I2C(i2c)
-bno.mode = adafruit_bno055.IMUPLUS_MODE
-bno.accel_range = adafruit_bno055.ACCEL_16G
+SAMPLES = 1000
 
 def average_none(data):
     noneIdx = np.where(np.isnan(data.astype(float)))[0]
@@ -47,8 +50,8 @@ def acc_to_pos(data_acc, data_qua, data_time):
 
     # Calculate vel and disp (cumulative trapezoidal integration)            
     print("Calculating position...")
-    calc_vel = map(lambda acc_arr: it.cumtrapz(acc_arr, data_time, initial=0), data_acc.T)
-    calc_pos = np.array(list(map(lambda vel_arr: it.cumtrapz(vel_arr, data_time, initial=0), calc_vel))).T
+    calc_vel = map(lambda acc_arr: it.cumulative_trapezoid(acc_arr, data_time, initial=0), data_acc.T)
+    calc_pos = np.array(list(map(lambda vel_arr: it.cumulative_trapezoid(vel_arr, data_time, initial=0), calc_vel))).T
 
     print("Calculated positions")
     print(calc_pos)
@@ -63,5 +66,26 @@ def filter_noise(values, noise):
     return tuple(filtered)
 
 
+def main(argv):
+    # IMU (IMUPLUS mode, 16G) or a recording replayed in real time
+    if(argv):
+        bno = devices.open_replay(argv[0]).imu
+    else:
+        bno = devices.open_imu(accel_range=16)
+
+    data_acc, data_qua, data_time = [], [], []
+    start = last_sample = time.monotonic()
+    print("Collecting samples...")
+    while len(data_time) < SAMPLES:
+        this_sample = time.monotonic()
+        if(this_sample - last_sample >= 1/SAMPLE_RATE):
+            last_sample = this_sample
+            data_acc.append(bno.linear_acceleration)
+            data_qua.append(bno.quaternion)
+            data_time.append(this_sample - start)
+
+    return acc_to_pos(data_acc, data_qua, data_time)
+
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main(sys.argv[1:])
\ No newline at end of file
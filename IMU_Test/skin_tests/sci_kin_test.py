@@ -1,3 +1,7 @@
+# usage: python sci_kin_test.py [recording]
+#   recording: replay a data.txt / Xsens txt / blackbox log instead of reading the BNO055
+#              (no GPIO signal and no prompt, one collection run)
+
 import time
 import numpy as np
 import pandas as pd
@@ -6,11 +10,6 @@ import pandas as pd
 import os
 import sys
 
-# Sensor
-import board
-import RPi.GPIO as GPIO
-import adafruit_bno055
-
 from skinematics.imus import IMU_Base
 from scipy.spatial.transform import Rotation as R
 
@@ -18,6 +17,10 @@ parent_dir = os.path.abspath(os.path.join( os.path.dirname(__file__), '..' ))
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
+# Sensor: device layer (Programs/devices.py)
+sys.path.append(os.path.join(parent_dir, '..', 'Programs'))
+import devices
+
 
 class XSens(IMU_Base):
     """Concrete class based on abstract base class IMU_Base """    
@@ -77,26 +80,32 @@ if __name__ == '__main__':
     count = 0
     rate = 100
 
-    # GPIO Setup (6th Top-right pin is GPIO18)
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setwarnings(False)
-    GPIO.setup(18,GPIO.OUT)
-    GPIO.output(18,GPIO.LOW)
-
-    # BNO Setup
-    i2c = board.I2C()
-    bno = adafruit_bno055.BNO055_I2C(i2c)
-    bno.mode = adafruit_bno055.IMUPLUS_MODE
-    bno.accel_range = adafruit_bno055.ACCEL_8G
+    replay = len(sys.argv) > 1
+    GPIO = None
+    if(replay):
+        bno = devices.open_replay(sys.argv[1]).imu
+    else:
+        # GPIO Setup (6th Top-right pin is GPIO18)
+        import RPi.GPIO as GPIO
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setwarnings(False)
+        GPIO.setup(18,GPIO.OUT)
+        GPIO.output(18,GPIO.LOW)
+
+        # BNO Setup (IMUPLUS mode, 8G)
+        bno = devices.open_imu(accel_range=8)
 
     # Calibration step
     print("Calibrating BNO055...")
     while(bno.calibration_status[1] != 3 or bno.calibration_status[2] != 3):
         pass
     print("Calibrated!")
-    GPIO.output(18,GPIO.HIGH)   # Signal is calibrated
+    if(GPIO is not None):
+        GPIO.output(18,GPIO.HIGH)   # Signal is calibrated
 
-    while(input("Continue testing? (Y/n):").lower() == "y"):
+    runs = 0
+    while((replay and runs == 0) or (not replay and input("Continue testing? (Y/n):").lower() == "y")):
+        runs += 1
         count = 0
         # init_orient = R.from_euler('zyx', [deg_N,90,0], degrees=True).as_matrix()   # Yaw, Pitch, Roll
         quat = bno.quaternion                        # [w,x,y,z]   scalar first format (Bosch + Skin convention)
@@ -1,78 +1,73 @@
-# return acceleration or quarternion data without none
-def data_none(data):
-    # if the leftmost data has none in them 
-    if None in data[0]:
-        #replace the value with the next not none value
-        for i in range(len(data[0])):
-            if data[0][i] == None:
-                index = next_not_none(data, 0, i)
-                if index == None:
-                    error = "all values at axis %d is none" % i
-                    return error
-                data[0][i] = data[index][i]
-    
-    # if the rightmost data has none in them
-    if None in data[len(data)-1]:
-        # replace the rightmost data with not none value
-        for i in range(len(data[len(data)-1])):
-            if data[len(data)-1][i] == None:
-                index = prev_not_none(data, len(data)-1, i)
-                if index == None:
-                    error = "all values at axis %d is none" % i
-                    return error
-                data[len(data)-1][i] = data[index][i]
+import smoothing
+import dtypes
+
+# Gap filling for missing (None / NaN) samples, vectorized over whole (N, M) arrays:
+#   "interp": linear interpolation between the neighbouring valid samples (acceleration)
+#   "hold":   last valid value carried forward (quaternion)
+# Samples before the first / after the last valid value are handled by 'edges':
+#   "nearest": nearest valid value, "zero": 0, "nan": left missing
+METHODS = ("interp", "hold")
+EDGES = ("nearest", "zero", "nan")
+
+# return (filled float array in the compute dtype (dtypes.py), mask of the samples that had a missing value)
+# data: (N, M) list (None for missing values) or array (NaN for missing values), not modified
+# method: "interp" or "hold", by default "interp" for 3 columns (acc) and "hold" otherwise (quaternion)
+# t: sample times (N) to interpolate against, by default the sample index
+# raises ValueError if a column has no valid value
+def fill_gaps(data, method=None, edges="nearest", t=None):
+    import numpy as np
+    data = dtypes.as_float(data)
+    if(data.ndim == 1):
+        data = data[:, None]
+    if(method is None):
+        method = "interp" if data.shape[1] == 3 else "hold"
+    if(method not in METHODS):
+        raise ValueError(f"method must be one of {METHODS}")
+    if(edges not in EDGES):
+        raise ValueError(f"edges must be one of {EDGES}")
 
-    # for any none values in between, average for acc, or replace with the left for quaternion
-    for i in range(1, len(data)-1):
-        if None in data[i] and len(data[i]) == 3:
-            # replace the none with the average of previous and next element
-            for axis in range(len(data[i])):
-                if data[i][axis] == None:
-                    prev = prev_not_none(data, i, axis)
-                    next = next_not_none(data, i, axis)
-                    if prev == None or next == None:
-                        error = "all values at axis %d is none" % i
-                        return error
-                    # average = (data[prev][axis] + data[next][axis])/2
-                    data[i][axis] = (data[prev][axis] + data[next][axis])/2
-        if None in data[i] and len(data[i]) == 4:
-            # replace the none with the first not none value to the left for the quaternion
-            for axis in range(len(data[i])):
-                if data[i][axis] == None:
-                    prev = prev_not_none(data, i, axis)
-                    if prev == None:
-                        error = "all values at axis %d is none" % i
-                        return error
-                    data[i][axis] = data[prev][axis]
-    return data
+    # Work on one contiguous column at a time (at most 4 columns, no per-sample Python)
+    columns = data.T.copy()
+    n = len(data)
+    mask = np.zeros(n, dtype=bool)
+    index = np.arange(n)
+    x = index if t is None else np.asarray(t, dtype=np.float64)
+    for axis, column in enumerate(columns):
+        gaps = np.isnan(column)
+        if(not gaps.any()):
+            continue
+        ok = ~gaps
+        valid = np.flatnonzero(ok)
+        if(len(valid) == 0):
+            raise ValueError("all values at axis %d are none" % axis)
+        mask |= gaps
 
-# return the index of first not none value after the input index at the given axis
-# return None if all values after the index is None
-def next_not_none(data, index, axis):
-    for i in range(index+1, len(data)):
-        if data[i][axis] != None:
-            return i
-    return None
+        if(method == "interp"):
+            column[gaps] = np.interp(x[gaps], x[valid], column[valid])   # nearest value past the edges
+        else:
+            # Index of the last valid sample at or before each sample
+            source = np.where(ok, index, valid[0])      # before the first valid sample: the first one
+            np.maximum.accumulate(source, out=source)
+            column[:] = column[source]
 
-# return the index of first not none value before the input index at the given axis
-# return None if all values after the index is None
-def prev_not_none(data, index, axis):
-    for i in range(index-1, -1, -1):
-        if data[i][axis] != None:
-            return i
-    return None
+        if(edges != "nearest"):
+            fill = 0.0 if edges == "zero" else np.nan
+            column[:valid[0]] = fill
+            column[valid[-1] + 1:] = fill
+    return columns.T, mask
+
+# return acceleration or quarternion data without none (see fill_gaps)
+# kept for existing callers: returns the filled array, or an error string if a column is all none
+def data_none(data, method=None, edges="nearest"):
+    try:
+        return fill_gaps(data, method, edges)[0]
+    except ValueError as err:
+        return str(err)
     
-# return a list of averaged acceleration, assuming input data has no None values
+# return averaged acceleration (average of the previous and next sample), assuming input data has no None values
+# see smoothing.py for the other filters
 def average_acc(acc_data):
-    # initialize averaged acceleration data
-    averaged = [[0]*len(acc_data[0])]*len(acc_data)
-    # averaged = [[0] * len(acc_data) for _ in range(acc_data[0])]
-    averaged[0] = acc_data[0]
-    averaged[len(averaged)-1] = acc_data[len(averaged)-1]
-    for i in range(1, len(acc_data)-1):
-        for axis in range(len(acc_data[i])):
-            averaged[i][axis] = (acc_data[i-1][axis]+acc_data[i+1][axis])/2
-    return averaged
+    return smoothing.neighbor_average(acc_data)
 
 # for testing purposes 
 
@@ -89,10 +84,10 @@ data2 = [[1, 23, 51],
         [2, 4, 1]]
 print('prior to treatment')
 print(data2)
-treated = data_none(data2)
-print('after getting rid of none')
-print(data2)
-average = average_acc(data2)
+treated, filled = fill_gaps(data2)
+print('after getting rid of none (filled samples %s)' % filled)
+print(treated)
+average = average_acc(treated)
 print("here's the output")
 print(average)
 """
\ No newline at end of file
@@ -0,0 +1,306 @@
+# Binary blackbox log
+#
+# File layout:  16-byte header | fixed-size little-endian records
+#   header: magic b"WUBB", version (uint16), record size (uint16), 8 reserved bytes
+#   record: time (float64), acc xyz, gyro xyz, quaternion wxyz (float32), flags (uint32)
+#
+# Missing (None) sensor values are stored as NaN and flagged, so a record never needs
+# formatting.  Records are packed into a preallocated buffer and written out one block
+# at a time, which keeps the flight loop free of per-sample string building and syscalls.
+
+import os
+import queue
+import struct
+import threading
+import time
+
+MAGIC = b"WUBB"
+VERSION = 1
+HEADER = struct.Struct("<4sHH8x")
+RECORD = struct.Struct("<d3f3f4fI")
+
+# Flags
+FLAG_ACC_MISSING = 1 << 0
+FLAG_GYR_MISSING = 1 << 1
+FLAG_QUA_MISSING = 1 << 2
+FLAG_PHASE_SHIFT = 8                # bits 8-11: flight phase code (phases.py), the sample rate can change with it
+FLAG_PHASE_MASK = 0xF << FLAG_PHASE_SHIFT
+
+CLOSE_TIMEOUT = 10.0                # (s) AsyncBlackbox.close: longest wait for the queue / the worker
+
+NAN = float("nan")
+_NAN3 = (NAN, NAN, NAN)
+_NAN4 = (NAN, NAN, NAN, NAN)
+
+
+def _clean(values, missing, flag):
+    # Returns (values, flag bit); any None replaces the whole vector with NaN
+    if(values is None or None in values):
+        return missing, flag
+    return values, 0
+
+
+class BlackboxWriter:
+
+    def __init__(self, path, block_records=256, append=False):
+        '''
+        @param path: log file path
+        @param block_records: number of records buffered before each write to disk
+        @param append: keep the records of an existing log and add to it (resume after a
+                       restart); a partial trailing record is cut off first.  Without it,
+                       or if there is no valid log, the file is truncated and a fresh
+                       header written
+        '''
+        self.path = path
+        self.block_records = block_records
+        self.records = 0                    # Records in the log, including buffered ones
+        self.flushed = 0                    # Records handed to the file (no longer buffered)
+        self._buf = bytearray(block_records*RECORD.size)
+        self._pending = 0
+        self._f = None
+        if(append):
+            self._f = self._open_append(path)
+        if(self._f is None):
+            self._f = open(path, "wb")
+            self._f.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+
+    def _open_append(self, path):
+        try:
+            f = open(path, "r+b")
+        except FileNotFoundError:
+            return None
+        try:
+            read_header(f)
+        except (ValueError, struct.error):
+            f.close()
+            return None
+        self.records = (os.fstat(f.fileno()).st_size - HEADER.size)//RECORD.size
+        f.truncate(HEADER.size + self.records*RECORD.size)
+        self.flushed = self.records
+        f.seek(0, os.SEEK_END)
+        return f
+
+    def write(self, t, acc, gyr, qua, flags=0):
+        acc, f_acc = _clean(acc, _NAN3, FLAG_ACC_MISSING)
+        gyr, f_gyr = _clean(gyr, _NAN3, FLAG_GYR_MISSING)
+        qua, f_qua = _clean(qua, _NAN4, FLAG_QUA_MISSING)
+        RECORD.pack_into(self._buf, self._pending*RECORD.size, t,
+                         acc[0], acc[1], acc[2],
+                         gyr[0], gyr[1], gyr[2],
+                         qua[0], qua[1], qua[2], qua[3],
+                         flags | f_acc | f_gyr | f_qua)
+        self._pending += 1
+        self.records += 1
+        if(self._pending == self.block_records):
+            self.flush()
+
+    def flush(self):
+        if(self._pending):
+            self._f.write(memoryview(self._buf)[:self._pending*RECORD.size])
+            self._pending = 0
+            self.flushed = self.records
+        self._f.flush()
+
+    def close(self, flush=True):
+        '''
+        @param flush: write out the buffered records and fsync first.  False after a
+                      storage error: the buffer and the file position are then unknown,
+                      so only the file descriptor is released
+        '''
+        if(self._f.closed):
+            return
+        if(not flush):
+            self._pending = 0
+            try:
+                self._f.close()
+            except OSError:
+                pass                # The descriptor is released even when the final flush fails
+            return
+        self.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncBlackbox:
+
+    def __init__(self, writer, maxsize=4096, clock=time.monotonic):
+        '''
+        Moves blackbox writes off the sampling loop onto a worker thread.
+        write() never blocks: when the queue is full the record is dropped and counted.
+
+        @param writer: BlackboxWriter that the worker thread writes into
+        @param maxsize: bounded queue length (records)
+        @param clock: time source used for write latency
+        '''
+        self.writer = writer
+        self.clock = clock
+        self.dropped = 0                # Records dropped because the queue was full
+        self.max_depth = 0              # Highest queue depth seen
+        self.written = 0                # Records written by the worker
+        self.write_time_max = 0.0       # Longest single write/flush on the worker (s)
+        self.write_time_total = 0.0
+        self.errors = 0                 # Exceptions raised by the writer
+        self.last_error = None
+        self.failed = False             # Storage error (OSError): later records are discarded
+        self.lost = 0                   # Records the worker could not write (bad record or failed writer)
+
+        self._queue = queue.Queue(maxsize)
+        self._stopped = False           # The worker reached the stop marker
+        self._thread = threading.Thread(target=self._run, name="blackbox", daemon=True)
+        self._thread.start()
+
+    def write(self, t, acc, gyr, qua, flags=0):
+        try:
+            self._queue.put_nowait((t, acc, gyr, qua, flags))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        depth = self._queue.qsize()
+        if(depth > self.max_depth):
+            self.max_depth = depth
+        return True
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        # No exception from the writer may stop the worker: the queue would fill up and
+        # close() would never return.  A record the writer cannot pack (TypeError,
+        # struct.error on an unexpected value) is dropped on its own, the records around
+        # it are still written.  After a storage fault (SD card I/O error, disk full) the
+        # writer's buffer is in an unknown state, so it is given up and the queue is just
+        # drained.
+        while True:
+            record = self._queue.get()
+            if(record is None):
+                self._stopped = True
+                break
+            if(self.failed):
+                self.lost += 1
+                continue
+            start = self.clock()
+            try:
+                self.writer.write(*record)
+            except OSError as e:
+                self._fail(e)
+                self.lost += 1
+                continue
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+                self.lost += 1
+                continue
+            elapsed = self.clock() - start
+            self.written += 1
+            self.write_time_total += elapsed
+            if(elapsed > self.write_time_max):
+                self.write_time_max = elapsed
+
+    def _fail(self, error):
+        self.errors += 1
+        self.last_error = error
+        self.failed = True
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        # Drain the queue, then flush and close the underlying writer.  Waits at most
+        # 'timeout' for room in the queue and again for the worker, never forever.
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        if(not self._stopped):
+            return                  # Worker stuck in a write: the file is still in use
+        if(self.failed):
+            self.writer.close(flush=False)
+            return
+        try:
+            self.writer.close()
+        except OSError as e:
+            self._fail(e)
+            self.writer.close(flush=False)
+
+    def report(self):
+        mean = self.write_time_total/self.written if self.written else 0.0
+        text = (f"written:{self.written} dropped:{self.dropped} depth:{self.depth()} max_depth:{self.max_depth} "
+                f"write mean:{mean*1000:.3f}ms max:{self.write_time_max*1000:.2f}ms errors:{self.errors}")
+        if(self.lost):
+            text += f" lost:{self.lost}"
+        if(self.last_error is not None):
+            text += f" last_error:{self.last_error!r}"
+        return text
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_header(f):
+    magic, version, record_size = HEADER.unpack(f.read(HEADER.size))
+    if(magic != MAGIC):
+        raise ValueError("not a blackbox log")
+    if(version != VERSION or record_size != RECORD.size):
+        raise ValueError(f"unsupported blackbox log (version {version}, record size {record_size})")
+    return version, record_size
+
+
+def blackbox_dtype():
+    import numpy as np
+    return np.dtype([("time", "<f8"),
+                     ("acc", "<f4", (3,)),
+                     ("gyr", "<f4", (3,)),
+                     ("qua", "<f4", (4,)),
+                     ("flags", "<u4")])
+
+
+def load_blackbox(path):
+    '''
+    Load a blackbox log straight into a NumPy structured array (no text parsing).
+    A partial trailing record (e.g. power loss mid-write) is ignored.
+
+    Return: structured array with fields time, acc (N,3), gyr (N,3), qua (N,4), flags
+    '''
+    import numpy as np
+    with open(path, "rb") as f:
+        read_header(f)
+        count = (os.fstat(f.fileno()).st_size - HEADER.size)//RECORD.size
+        return np.fromfile(f, dtype=blackbox_dtype(), count=count)
+
+
+def map_blackbox(path):
+    '''
+    Memory-map a blackbox log as a read-only structured array (same fields as
+    load_blackbox); slices are only read from disk when used, so logs larger than RAM
+    can be processed in blocks.  A partial trailing record is ignored.
+    '''
+    import numpy as np
+    with open(path, "rb") as f:
+        read_header(f)
+        count = (os.fstat(f.fileno()).st_size - HEADER.size)//RECORD.size
+    if(count == 0):
+        return np.zeros(0, dtype=blackbox_dtype())
+    return np.memmap(path, dtype=blackbox_dtype(), mode="r", offset=HEADER.size, shape=(count,))
+
+
+def iter_records(path):
+    # Pure-Python reader (no NumPy), yields (t, acc, gyr, qua, flags) with None for missing vectors
+    with open(path, "rb") as f:
+        read_header(f)
+        while True:
+            chunk = f.read(RECORD.size)
+            if(len(chunk) < RECORD.size):
+                return
+            r = RECORD.unpack(chunk)
+            flags = r[11]
+            acc = None if flags & FLAG_ACC_MISSING else r[1:4]
+            gyr = None if flags & FLAG_GYR_MISSING else r[4:7]
+            qua = None if flags & FLAG_QUA_MISSING else r[7:11]
+            yield r[0], acc, gyr, qua, flags
@@ -0,0 +1,226 @@
+# Burst-read path for the BNO055
+#
+# The Adafruit driver reads imu.linear_acceleration, imu.gyro and imu.quaternion as three
+# separate I2C transactions.  The fusion output registers are contiguous, so one
+# write_then_readinto() starting at GYR_DATA fetches all of them and the vectors are
+# decoded from that one buffer:
+#
+#   0x14-0x19 GYR_DATA  x,y,z   1/16 dps  -> rad/s (same units as imu.gyro)
+#   0x1A-0x1F EUL_DATA          (skipped)
+#   0x20-0x27 QUA_DATA  w,x,y,z 1/2^14
+#   0x28-0x2D LIA_DATA  x,y,z   1/100 m/s^2
+#
+# In fusion mode these registers are refreshed at 100 Hz (phases.FUSION_RATE); a faster
+# read returns the previous values again.
+#
+# SimRegisterMap/SimBNO055 emulate the register file and I2C device so this path can be
+# exercised without hardware (backed by a devices.ReplayIMU):
+# devices.open_replay(..., register_level=True), python replay.py --registers.
+
+import struct
+
+GYR_DATA = 0x14
+QUA_DATA = 0x20
+LIA_DATA = 0x28
+BURST_START = GYR_DATA
+BURST = struct.Struct("<3h3h4h3h")          # gyro, euler, quaternion, linear acceleration (26 bytes)
+
+GYR_SCALE = 0.001090830782496456            # rad/s per LSB (1/16 dps)
+QUA_SCALE = 1/(1 << 14)
+LIA_SCALE = 1/100
+
+_NONE3 = (None, None, None)
+_NONE4 = (None, None, None, None)
+
+
+def decode(buffer):
+    # (acc, gyr, qua) from a BURST sized buffer read at BURST_START
+    v = BURST.unpack_from(buffer)
+    return ((v[10]*LIA_SCALE, v[11]*LIA_SCALE, v[12]*LIA_SCALE),
+            (v[0]*GYR_SCALE, v[1]*GYR_SCALE, v[2]*GYR_SCALE),
+            (v[6]*QUA_SCALE, v[7]*QUA_SCALE, v[8]*QUA_SCALE, v[9]*QUA_SCALE))
+
+
+class BurstReader:
+
+    def __init__(self, imu):
+        '''
+        @param imu: adafruit_bno055.BNO055_I2C (or SimBNO055), anything with an 'i2c_device'
+        '''
+        self.device = imu.i2c_device
+        self.reads = 0
+        self.errors = 0
+        self._out = bytes([BURST_START])
+        self._buf = bytearray(BURST.size)
+
+    def read(self):
+        # One I2C transaction -> (acc, gyr, qua); None vectors on a bus error like the driver
+        try:
+            with self.device as i2c:
+                i2c.write_then_readinto(self._out, self._buf)
+        except OSError:
+            self.errors += 1
+            return _NONE3, _NONE3, _NONE4
+        self.reads += 1
+        return decode(self._buf)
+
+
+class AccReader:
+
+    def __init__(self, imu):
+        # Linear acceleration only: one 6 byte transaction at LIA_DATA
+        self.device = imu.i2c_device
+        self.reads = 0
+        self.errors = 0
+        self._out = bytes([LIA_DATA])
+        self._buf = bytearray(6)
+
+    def read(self):
+        try:
+            with self.device as i2c:
+                i2c.write_then_readinto(self._out, self._buf)
+        except OSError:
+            self.errors += 1
+            return _NONE3, None, None
+        self.reads += 1
+        x, y, z = struct.unpack_from("<3h", self._buf)
+        return (x*LIA_SCALE, y*LIA_SCALE, z*LIA_SCALE), None, None
+
+
+def make_reader(imu, channels=("acc", "gyr", "qua")):
+    '''
+    Fastest available way to read (acc, gyr, qua) from 'imu'; channels that are not
+    requested come back as None
+      - I2C reads for the real driver / register simulation (one burst, or a 6 byte
+        linear acceleration read when only "acc" is requested)
+      - a single sample() call for devices.ReplayIMU
+      - property reads otherwise
+    '''
+    channels = set(channels)
+    if(hasattr(imu, "i2c_device")):
+        if(channels <= {"acc"}):
+            return AccReader(imu).read
+        read = BurstReader(imu).read
+    elif(hasattr(imu, "sample")):
+        read = imu.sample
+    else:
+        def read():
+            return (imu.linear_acceleration if "acc" in channels else None,
+                    imu.gyro if "gyr" in channels else None,
+                    imu.quaternion if "qua" in channels else None)
+        return read
+
+    if(channels >= {"acc", "gyr", "qua"}):
+        return read
+
+    def masked():
+        acc, gyr, qua = read()
+        return (acc if "acc" in channels else None,
+                gyr if "gyr" in channels else None,
+                qua if "qua" in channels else None)
+    return masked
+
+
+### SIMULATION ###
+
+def _counts(values, scale, n):
+    if(values is None or None in values):
+        return (0,)*n
+    return tuple(max(-32768, min(32767, round(v/scale))) for v in values)
+
+
+class SimRegisterMap:
+
+    def __init__(self):
+        self.registers = bytearray(0x80)
+
+    def set_sample(self, acc, gyr, qua):
+        BURST.pack_into(self.registers, BURST_START,
+                        *_counts(gyr, GYR_SCALE, 3), 0, 0, 0,
+                        *_counts(qua, QUA_SCALE, 4), *_counts(acc, LIA_SCALE, 3))
+
+
+class SimI2CDevice:
+
+    def __init__(self, registers, on_read=None):
+        '''
+        @param registers: SimRegisterMap
+        @param on_read: called before each read transaction (e.g. to load the next sample)
+        '''
+        self.registers = registers
+        self.on_read = on_read
+        self.transactions = 0
+        self._addr = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write(self, buf, start=0, end=None):
+        self._addr = buf[start]
+        self.transactions += 1
+
+    def readinto(self, buf, start=0, end=None):
+        if(self.on_read):
+            self.on_read()
+        end = len(buf) if end is None else end
+        buf[start:end] = self.registers.registers[self._addr:self._addr + end - start]
+        self.transactions += 1
+
+    def write_then_readinto(self, out_buffer, in_buffer, out_start=0, out_end=None, in_start=0, in_end=None):
+        self._addr = out_buffer[out_start]
+        if(self.on_read):
+            self.on_read()
+        in_end = len(in_buffer) if in_end is None else in_end
+        in_buffer[in_start:in_end] = self.registers.registers[self._addr:self._addr + in_end - in_start]
+        self.transactions += 1
+
+
+class SimBNO055:
+
+    def __init__(self, source):
+        '''
+        Register-level BNO055 simulation
+        @param source: devices.ReplayIMU (or anything with sample() -> (acc, gyr, qua))
+        '''
+        self.source = source
+        self.registers = SimRegisterMap()
+        self.i2c_device = SimI2CDevice(self.registers, self._load)
+        self.mode = None
+        self.accel_range = None
+        self.calibration_status = (3, 3, 3, 3)
+
+    # Replay bookkeeping of a devices.ReplayIMU source (replay.py)
+    @property
+    def reads(self):
+        return self.source.reads
+
+    def duration(self):
+        return self.source.duration()
+
+    def finished(self):
+        return self.source.finished()
+
+    def _load(self):
+        self.registers.set_sample(*self.source.sample())
+
+    def _read(self, address, fmt, scale):
+        size = struct.calcsize(fmt)
+        buf = bytearray(size)
+        self.i2c_device.write_then_readinto(bytes([address]), buf)
+        return tuple(v*scale for v in struct.unpack(fmt, buf))
+
+    # Same per-property transactions as the Adafruit driver
+    @property
+    def linear_acceleration(self):
+        return self._read(LIA_DATA, "<3h", LIA_SCALE)
+
+    @property
+    def gyro(self):
+        return self._read(GYR_DATA, "<3h", GYR_SCALE)
+
+    @property
+    def quaternion(self):
+        return self._read(QUA_DATA, "<4h", QUA_SCALE)
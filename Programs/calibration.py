@@ -0,0 +1,152 @@
+# Persisted BNO055 calibration profiles
+#
+# A full calibration (waiting for gyro and accel calibration_status to reach 3) can take
+# minutes on the pad.  After a good calibration the sensor offsets are saved to disk and
+# restored at the next boot.  The restored profile is accepted when the offsets read back
+# from the sensor match the file, the gyro status reaches 3 within a short timeout and
+# the gravity reading is plausible; otherwise we fall back to a full calibration and save
+# the new offsets.  The accel status is not part of the test: with restored offsets the
+# BNO055 keeps reporting it below 3 until it has been moved through several
+# orientations, which a payload sitting on the pad never is.
+#
+# Polling sleeps between reads instead of spinning, to save CPU and battery on the pad.
+
+import json
+import math
+import os
+import time
+
+PROFILE_FILE = "bno055_calibration.json"
+PROFILE_FIELDS = ("offsets_accelerometer", "offsets_gyroscope", "offsets_magnetometer",
+                  "radius_accelerometer", "radius_magnetometer")
+
+GRAVITY = 9.80665
+GRAVITY_TOLERANCE = 0.5         # (m/s^2) allowed error of |gravity| with a restored profile
+VALIDATE_TIMEOUT = 10           # (seconds) for the gyro status to confirm a restored profile
+POLL_INTERVAL = 0.1             # (seconds) between calibration_status reads
+
+
+def is_calibrated(imu, accel=True):
+    # Gyro (and accel) calibration status 3
+    status = imu.calibration_status
+    return status[1] == 3 and (not accel or status[2] == 3)
+
+
+def wait_calibrated(imu, timeout=None, sleep=time.sleep, clock=time.monotonic, accel=True):
+    # Poll until gyro (and accel) report fully calibrated; False on timeout
+    start = clock()
+    while not is_calibrated(imu, accel):
+        if(timeout is not None and clock() - start >= timeout):
+            return False
+        sleep(POLL_INTERVAL)
+    return True
+
+
+def save_profile(imu, path=PROFILE_FILE):
+    # Write the current sensor offsets to 'path' (atomic rename), False if the IMU has none
+    try:
+        profile = {field: getattr(imu, field) for field in PROFILE_FIELDS}
+    except AttributeError:
+        return False
+    profile = {k: list(v) if isinstance(v, tuple) else v for k, v in profile.items()}
+    profile["saved"] = time.time()
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(profile, f)
+    os.replace(tmp, path)
+    return True
+
+
+def _read_profile(path):
+    # {field: value} of a saved profile, None if there is no usable profile
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+        return {field: profile[field] for field in PROFILE_FIELDS}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _normalized(value):
+    # Offsets are 3-tuples on the sensor and lists in JSON
+    return tuple(value) if isinstance(value, (list, tuple)) else value
+
+
+def load_profile(imu, path=PROFILE_FILE):
+    # Write saved offsets into the sensor, False if there is no usable profile
+    values = _read_profile(path)
+    if(values is None):
+        return False
+    try:
+        for field, value in values.items():
+            setattr(imu, field, _normalized(value))
+    except (AttributeError, OSError, ValueError):
+        return False
+    return True
+
+
+def profile_matches(imu, path=PROFILE_FILE):
+    # The offsets read back from the sensor are the saved ones (the write took effect)
+    values = _read_profile(path)
+    if(values is None):
+        return False
+    try:
+        return all(_normalized(getattr(imu, field)) == _normalized(value) for field, value in values.items())
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def gravity_ok(imu):
+    # Restored offsets should give |gravity| close to 1 g while sitting on the pad
+    gravity = getattr(imu, "gravity", None)
+    if(gravity is None or None in gravity):
+        return True         # Nothing to check against
+    return abs(math.sqrt(sum(g*g for g in gravity)) - GRAVITY) <= GRAVITY_TOLERANCE
+
+
+def startup_calibration(imu, path=PROFILE_FILE, validate_timeout=VALIDATE_TIMEOUT, sleep=time.sleep, clock=time.monotonic):
+    '''
+    Restore the saved profile if the sensor accepts it, else run a full calibration.
+
+    Return: report dict
+        source: "profile" (restored and validated) or "full" (full calibration),
+                "resume" from resume_calibration()
+        restored: a profile was written to the sensor
+        saved: a new profile was saved
+        seconds: time spent
+    '''
+    start = clock()
+    report = {"source": "full", "restored": False, "saved": False}
+
+    if(load_profile(imu, path)):
+        report["restored"] = True
+        if(profile_matches(imu, path) and wait_calibrated(imu, validate_timeout, sleep, clock, accel=False)
+                and gravity_ok(imu)):
+            report["source"] = "profile"
+
+    if(report["source"] == "full"):
+        wait_calibrated(imu, None, sleep, clock)
+        report["saved"] = save_profile(imu, path)
+
+    report["seconds"] = clock() - start
+    return report
+
+
+def resume_calibration(imu, path=PROFILE_FILE, clock=time.monotonic):
+    # Resuming in flight: write the saved offsets without validation (gravity is not 1 g)
+    start = clock()
+    restored = load_profile(imu, path)
+    return {"source": "resume", "restored": restored, "saved": False, "seconds": clock() - start}
+
+
+def format_report(report):
+    if(report["source"] == "resume"):
+        text = "profile restored in flight" if report["restored"] else "no profile, in flight"
+    elif(report["source"] == "profile"):
+        text = "restored profile"
+    elif(report["restored"]):
+        text = "profile rejected, full calibration"
+    else:
+        text = "full calibration"
+    saved = ", profile saved" if report["saved"] else ""
+    return f"{text} in {report['seconds']:.1f} s{saved}"
@@ -0,0 +1,145 @@
+# Mission state checkpoints
+#
+# While in flight the mission periodically saves its phase, launch coordinates, detection
+# timers, streaming integrator state and blackbox record count, so a restarted payload process can
+# resume in the right phase and append to the existing blackbox log instead of starting
+# over in standby.
+#
+# A checkpoint is one fixed-size binary record packed into a preallocated buffer and
+# written with a single pwrite() (no allocation, rename or fsync), which is cheap enough
+# to run at flight rate.  The file holds two slots that are written alternately; each
+# slot carries a sequence number and a CRC32, so a write torn by a crash leaves the other
+# slot intact and load() returns the newest valid one.
+#
+# The process restarting does not lose the page cache, so no fsync is needed for that
+# case; the blackbox log is fsynced when it is closed.
+
+import binascii
+import collections
+import math
+import os
+import struct
+
+from integrator import IntegratorState
+
+CHECKPOINT_FILE = "mission_state.chk"
+MAGIC = b"WUCK"
+VERSION = 1
+
+# magic, version, seq, boot id, phase code,
+# clock, launch_start, launch_time, time_flight, phase_start, still_since, lat, lon,
+# integrator t, acc xyz, velocity xyz, position xyz, quaternion wxyz, samples, gaps,
+# blackbox records, frame seq
+STATE = struct.Struct("<4sHxxI16sB7x8dd3d3d3d4dIIQH2x")
+CRC = struct.Struct("<I")
+SLOT_SIZE = 256                     # Slot offsets stay inside one 512 byte sector
+
+MissionState = collections.namedtuple("MissionState", [
+    "seq",
+    "boot_id",          # Kernel boot id (16 bytes), tells whether 'clock' values are comparable
+    "phase",            # phases.Phase code
+    "clock",            # Mission clock at the checkpoint
+    "launch_start",     # Mission clock at launch (flight time 0)
+    "launch_time",      # (s) launch detection time from start of standby
+    "time_flight",      # (s) flight time of the checkpoint
+    "phase_start",      # (s) flight time the current phase was entered
+    "still_since",      # (s) flight time of the start of the motionless stretch, None if moving
+    "launch_coord",     # (lat, lon), None without a fix
+    "integrator",       # integrator.IntegratorState
+    "log_records",      # Records flushed to the blackbox log (BlackboxWriter.flushed): a resumed
+                        # log must hold at least these.  Where to append is taken from the
+                        # log's size, which can be ahead of the checkpoint
+    "frame_seq",        # Next telemetry frame sequence number
+])
+
+assert STATE.size + CRC.size <= SLOT_SIZE
+
+NAN = float("nan")
+
+
+def boot_id():
+    # 16 byte id of the current boot (Linux), zeros where it is not available
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return bytes.fromhex(f.read().strip().replace("-", ""))
+    except (OSError, ValueError):
+        return bytes(16)
+
+
+def _opt(value):
+    return NAN if value is None else value
+
+
+def _none(value):
+    return None if math.isnan(value) else value
+
+
+class Checkpointer:
+
+    def __init__(self, path=CHECKPOINT_FILE, previous=None):
+        '''
+        @param path: checkpoint file
+        @param previous: MissionState being resumed (its file is kept and the sequence
+                         continues), None for a new mission (the file is truncated)
+        '''
+        self.path = path
+        self.boot_id = boot_id()
+        self.seq = 0 if previous is None else previous.seq + 1
+        self.saves = 0
+        self._buf = bytearray(SLOT_SIZE)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if(previous is None):
+            os.ftruncate(self._fd, 0)
+
+    def save(self, phase, clock, launch_start, launch_time, time_flight, phase_start, still_since,
+             launch_coord, integrator, log_records, frame_seq):
+        # Write a checkpoint into the older slot ('integrator' is an IntegratorState)
+        lat, lon = launch_coord if launch_coord is not None else (NAN, NAN)
+        STATE.pack_into(self._buf, 0, MAGIC, VERSION, self.seq, self.boot_id, phase,
+                        clock, launch_start, launch_time, time_flight, phase_start, _opt(still_since), lat, lon,
+                        _opt(integrator.t), *integrator.acc, *integrator.velocity, *integrator.position,
+                        *integrator.qua, integrator.samples, integrator.gaps,
+                        log_records, frame_seq)
+        CRC.pack_into(self._buf, STATE.size, binascii.crc32(memoryview(self._buf)[:STATE.size]))
+        os.pwrite(self._fd, self._buf, (self.seq % 2)*SLOT_SIZE)
+        self.seq += 1
+        self.saves += 1
+
+    def close(self):
+        if(self._fd is not None):
+            os.close(self._fd)
+            self._fd = None
+
+    def clear(self):
+        # Mission complete: remove the checkpoint so the next start is a new mission
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _unpack(slot):
+    if(len(slot) < STATE.size + CRC.size):
+        return None
+    crc, = CRC.unpack_from(slot, STATE.size)
+    if(crc != binascii.crc32(slot[:STATE.size])):
+        return None
+    v = STATE.unpack_from(slot)
+    if(v[0] != MAGIC or v[1] != VERSION):
+        return None
+    lat, lon = v[11], v[12]
+    integrator = IntegratorState(_none(v[13]), v[14:17], v[17:20], v[20:23], v[23:27], v[27], v[28])
+    return MissionState(v[2], v[3], v[4], v[5], v[6], v[7], v[8], v[9], _none(v[10]),
+                        None if math.isnan(lat) else (lat, lon), integrator, v[29], v[30])
+
+
+def load(path=CHECKPOINT_FILE):
+    # Newest valid MissionState in 'path', None if there is none
+    try:
+        with open(path, "rb") as f:
+            data = f.read(2*SLOT_SIZE)
+    except OSError:
+        return None
+    states = [s for s in (_unpack(data[:SLOT_SIZE]), _unpack(data[SLOT_SIZE:])) if s is not None]
+    return max(states, key=lambda s: s.seq, default=None)
@@ -0,0 +1,294 @@
+# Device layer: real Adafruit drivers or simulated replay backends
+#
+# Everything the flight programs touch on the IMU, GPS and radio goes through the
+# objects returned here, so mission code runs the same against hardware on the Pi or
+# against recorded data on a dev box.  Hardware libraries are imported only when the
+# hardware backend is opened, never at import time.
+#
+# Simulated devices mimic the attributes the mission uses:
+#   IMU    linear_acceleration, gyro, quaternion, calibration_status, mode, accel_range
+#   GPS    update(), send_command(), has_fix, latitude, longitude
+#   Radio  send(), receive(), tx_power
+
+import collections
+import time
+
+Devices = collections.namedtuple("Devices", ["imu", "gps", "radio"])
+
+# Radio configuration
+RF_CHANNEL = 7
+RF_FREQ = 434.550 + RF_CHANNEL * 0.1
+
+
+### HARDWARE ###
+
+def setup_rf(spi, CS, RESET, FREQ):
+    import adafruit_rfm9x
+    while True:
+        # Attempt setting up RFM9x Module
+        try:
+            rfm9x = adafruit_rfm9x.RFM9x(spi, CS, RESET, FREQ)
+            rfm9x.tx_power = 23
+            print('RFM9x SET\n')
+            return rfm9x
+
+        except RuntimeError as error:
+            print('RFM9 ERR: Check wiring\n')
+
+
+def open_imu(i2c=None, accel_range=16):
+    '''
+    BNO055 on the I2C bus in IMUPLUS (no magnetometer) fusion mode
+    @param i2c: bus to use, None opens board.I2C()
+    @param accel_range: accelerometer range in g (2, 4, 8 or 16)
+    '''
+    import board
+    import adafruit_bno055
+
+    if(i2c is None):
+        i2c = board.I2C()
+    imu = adafruit_bno055.BNO055_I2C(i2c)
+    imu.mode = adafruit_bno055.IMUPLUS_MODE     # NO MAGNETOMETER MODE
+    imu.accel_range = getattr(adafruit_bno055, f"ACCEL_{accel_range}G")
+    return imu
+
+
+def open_hardware():
+    # Board
+    import board
+    import busio
+    from digitalio import DigitalInOut
+
+    # Adafruit libraries
+    import adafruit_gps
+
+    i2c = board.I2C()
+
+    # GPS
+    gps = adafruit_gps.GPS_GtopI2C(i2c, debug=False)
+    gps.send_command(b"PMTK314,0,1,0,1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0")
+    gps.send_command(b"PMTK220,1000")
+
+    # IMU
+    imu = open_imu(i2c, accel_range=16)
+
+    # RF
+    CS = DigitalInOut(board.CE1)
+    RESET = DigitalInOut(board.D25)
+    spi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)
+    rfm9x = setup_rf(spi, CS, RESET, RF_FREQ)
+
+    return Devices(imu, gps, rfm9x)
+
+
+### RECORDED DATA ###
+# Every loader returns a list of (t, acc, gyr, qua) records, t in seconds from the first sample
+
+def _remove_gravity(records, still_samples):
+    # Raw accelerometer logs include gravity; estimate it from the (still) start and remove it
+    n = min(still_samples, len(records))
+    if(n == 0):
+        return records
+    g = [sum(r[1][axis] for r in records[:n])/n for axis in range(3)]
+    return [(t, (acc[0]-g[0], acc[1]-g[1], acc[2]-g[2]), gyr, qua) for t, acc, gyr, qua in records]
+
+
+def load_imu_csv(path, rate=100, still_samples=100):
+    '''
+    IMU_Test/data.txt style: comma separated gyro xyz, acc xyz, mag xyz per line at 'rate' Hz.
+    There is no orientation in these logs, so the quaternion is held at identity.
+    '''
+    records = []
+    with open(path) as f:
+        for i, line in enumerate(f):
+            values = [float(v) for v in line.split(',')]
+            records.append((i/rate, tuple(values[3:6]), tuple(values[0:3]), (1.0, 0.0, 0.0, 0.0)))
+    return _remove_gravity(records, still_samples)
+
+
+def load_xsens_txt(path, still_samples=50):
+    '''
+    IMU_Test/skin_tests/test_data.txt style: '//' header lines (including the sample rate),
+    then tab separated columns Counter, Acc_*, Gyr_*, Mag_*, Quat_w..z.
+    '''
+    rate = 100.0
+    records = []
+    columns = None
+    with open(path) as f:
+        for line in f:
+            if(line.startswith("//")):
+                if("Sample rate" in line):
+                    rate = float(line.split(":")[1].strip().rstrip("Hz"))
+                continue
+            fields = line.split()
+            if(not fields):
+                continue
+            if(columns is None):
+                columns = {name: i for i, name in enumerate(fields)}
+                continue
+            values = [float(v) for v in fields]
+            col = lambda *names: tuple(values[columns[n]] for n in names)
+            records.append((len(records)/rate,
+                            col("Acc_X", "Acc_Y", "Acc_Z"),
+                            col("Gyr_X", "Gyr_Y", "Gyr_Z"),
+                            col("Quat_w", "Quat_x", "Quat_y", "Quat_z")))
+    return _remove_gravity(records, still_samples)
+
+
+def load_blackbox_log(path):
+    # Blackbox logs already hold linear acceleration and orientation
+    from blackbox import iter_records
+    return [(t, acc, gyr, qua) for t, acc, gyr, qua, flags in iter_records(path)]
+
+
+def load_recording(path):
+    # Pick a loader from the file contents
+    with open(path, "rb") as f:
+        head = f.read(4)
+    if(head == b"WUBB"):
+        return load_blackbox_log(path)
+    if(head.startswith(b"//")):
+        return load_xsens_txt(path)
+    return load_imu_csv(path)
+
+
+### SIMULATED DEVICES ###
+
+class ReplayIMU:
+
+    def __init__(self, records, clock=time.monotonic, pad_before=0.0, pad_after=0.0):
+        '''
+        Serves recorded samples according to the clock, like a sensor sampled in real time.
+
+        @param records: list of (t, acc, gyr, qua)
+        @param clock: time source (use the same virtual clock as the mission for replay)
+        @param pad_before: seconds of motionless samples served before the recording starts
+        @param pad_after: seconds of motionless samples served after the recording ends
+        '''
+        self.records = records
+        self.clock = clock
+        self.pad_before = pad_before
+        self.pad_after = pad_after
+        self.mode = None
+        self.accel_range = None
+        self.calibration_status = (3, 3, 3, 3)
+        self.reads = 0
+        self._start = None
+        self._idx = 0
+        self._still = (0.0, 0.0, 0.0)
+        self._rest_qua = records[0][3] if records else (1.0, 0.0, 0.0, 0.0)
+        self._end_qua = records[-1][3] if records else (1.0, 0.0, 0.0, 0.0)
+
+    def _elapsed(self):
+        if(self._start is None):
+            self._start = self.clock()
+        return self.clock() - self._start - self.pad_before
+
+    def duration(self):
+        return self.pad_before + (self.records[-1][0] if self.records else 0.0) + self.pad_after
+
+    def finished(self):
+        return self._elapsed() > (self.records[-1][0] if self.records else 0.0) + self.pad_after
+
+    def sample(self):
+        # Current (acc, gyr, qua)
+        self.reads += 1
+        t = self._elapsed()
+        if(t < 0 or not self.records):
+            return self._still, self._still, self._rest_qua
+        if(t > self.records[-1][0]):
+            return self._still, self._still, self._end_qua
+        # Samples are read in time order, so walk forward from the last position
+        while(self._idx + 1 < len(self.records) and self.records[self._idx + 1][0] <= t):
+            self._idx += 1
+        record = self.records[self._idx]
+        return record[1], record[2], record[3]
+
+    @property
+    def linear_acceleration(self):
+        return self.sample()[0]
+
+    @property
+    def gyro(self):
+        return self.sample()[1]
+
+    @property
+    def quaternion(self):
+        return self.sample()[2]
+
+
+class SimGPS:
+
+    def __init__(self, coord=None, fix_after=0.0, clock=time.monotonic):
+        '''
+        @param coord: (lat, lon) reported once a fix is acquired, None never gets a fix
+        @param fix_after: seconds after creation before the fix is acquired
+        '''
+        self.coord = coord
+        self.fix_after = fix_after
+        self.clock = clock
+        self.commands = []
+        self.updates = 0
+        self._created = clock()
+
+    def send_command(self, command):
+        self.commands.append(command)
+
+    def update(self):
+        self.updates += 1
+        return self.has_fix
+
+    @property
+    def has_fix(self):
+        return self.coord is not None and self.clock() - self._created >= self.fix_after
+
+    @property
+    def latitude(self):
+        return self.coord[0] if self.has_fix else None
+
+    @property
+    def longitude(self):
+        return self.coord[1] if self.has_fix else None
+
+
+class SimRadio:
+
+    def __init__(self, airtime=0.0, sleep=time.sleep, keep=True):
+        '''
+        @param airtime: seconds each send() blocks, like a LoRa packet on air
+        @param keep: keep sent packets in 'packets' (disable for very long runs)
+        '''
+        self.airtime = airtime
+        self.sleep = sleep
+        self.keep = keep
+        self.tx_power = 23
+        self.sent = 0
+        self.packets = []
+
+    def send(self, data):
+        if(self.airtime):
+            self.sleep(self.airtime)
+        self.sent += 1
+        if(self.keep):
+            self.packets.append(bytes(data))
+        return True
+
+    def receive(self, timeout=0.5):
+        return None
+
+
+def open_replay(path_or_records, clock=time.monotonic, sleep=time.sleep, launch_coord=None,
+                pad_before=1.0, pad_after=0.0, radio_airtime=0.0, register_level=False):
+    '''
+    @param register_level: serve the IMU through bno055_burst.SimBNO055, so the mission
+                           reads it with the same I2C transactions and register decoding
+                           as the real BNO055 (values quantized to the register LSBs)
+    '''
+    records = load_recording(path_or_records) if isinstance(path_or_records, str) else path_or_records
+    imu = ReplayIMU(records, clock, pad_before, pad_after)
+    if(register_level):
+        from bno055_burst import SimBNO055
+        imu = SimBNO055(imu)
+    gps = SimGPS(launch_coord, clock=clock)
+    radio = SimRadio(radio_airtime, sleep)
+    return Devices(imu, gps, radio)
@@ -0,0 +1,116 @@
+# Accuracy against speed of the dtype policies (dtypes.py)
+#
+# Runs the post-flight pipeline stages (gap filling, smoothing, rotation, integration)
+# under every policy on the same flight and reports the time per stage (best of
+# 'repeat'), the bytes of sample storage, and the final position error against the
+# float64 reference.
+#
+# usage: python dtype_report.py [samples | recording] [smoothing] [engine]
+#   samples:   length of a synthetic flight (default 100000), or
+#   recording: blackbox log / data.txt CSV / Xsens txt (devices.load_recording)
+
+import math
+import sys
+import time
+
+import average as avg
+import devices
+import dtypes
+import integration
+import position as pos
+import smoothing
+
+SAMPLES = 100000
+REPEAT = 5
+STAGES = ("fill", "smooth", "rotate", "integrate")
+
+
+def synthetic_flight(samples=SAMPLES, rate=100, gap_every=97):
+    '''
+    Boost, coast and a slowly rotating descent with noise and dropped reads
+    Return: (t, acc, qua) arrays, NaN for missing values
+    '''
+    import numpy as np
+    rng = np.random.default_rng(0)
+    t = np.arange(samples)/rate
+    acc = rng.normal(0, 0.3, (samples, 3))
+    acc[:, 2] += np.where(t < 2, 40.0, np.where(t < 8, -9.0, 0.0))
+    angle = 0.05*t
+    qua = np.stack([np.cos(angle/2), np.zeros(samples), np.zeros(samples), np.sin(angle/2)], axis=1)
+    acc[::gap_every] = np.nan
+    qua[5::gap_every*3] = np.nan
+    return t, acc, qua
+
+
+def load_flight(path):
+    import numpy as np
+    records = devices.load_recording(path)
+    t = np.array([r[0] for r in records], dtype=np.float64)
+    acc = dtypes.as_float([r[1] if r[1] is not None else (None,)*3 for r in records], np.float64)
+    qua = dtypes.as_float([r[3] if r[3] is not None else (None,)*4 for r in records], np.float64)
+    return t, acc, qua
+
+
+def run_stages(t, acc, qua, smooth, engine):
+    # One pass through the pipeline under the current policy: ({stage: seconds}, position track)
+    times = {}
+    start = time.perf_counter()
+    acc, _ = avg.fill_gaps(acc, "interp", t=t)
+    qua, _ = avg.fill_gaps(qua, "hold")
+    times["fill"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    acc = smoothing.smooth(acc, smooth, t=t)
+    times["smooth"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    nav_acc = pos.to_nav_frame(qua, acc)
+    times["rotate"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = integration.integrate_twice(nav_acc, t, engine)
+    times["integrate"] = time.perf_counter() - start
+    return times, result.position
+
+
+def report(t, acc, qua, smooth=pos.SMOOTHING, engine=pos.INTEGRATION, repeat=REPEAT):
+    import numpy as np
+    print(f"{len(t)} samples, {t[-1] - t[0]:.1f} s, smoothing {smooth}, integration {engine}")
+    header = "".join(f"{stage:>11}" for stage in STAGES)
+    print(f"{'policy':<13}{header}{'total':>11}{'storage':>10}{'final err':>12}{'max err':>12}")
+    reference = None
+    for name in dtypes.POLICIES:
+        with dtypes.using(name) as policy:
+            # Inputs as they would come out of sample storage under this policy
+            acc_in = acc.astype(policy.storage)
+            qua_in = qua.astype(policy.storage)
+            best = {stage: math.inf for stage in STAGES}
+            for _ in range(repeat):
+                times, track = run_stages(t, acc_in, qua_in, smooth, engine)
+                best = {stage: min(best[stage], times[stage]) for stage in STAGES}
+        track = np.asarray(track, dtype=np.float64)
+        if(reference is None):
+            reference = track
+        final_err = np.abs(track[-1] - reference[-1]).max()
+        max_err = np.abs(track - reference).max()
+        # SampleStore layout: float64 time plus 10 sensor columns (acc, gyr, qua)
+        storage = len(t)*(8 + 10*np.dtype(policy.storage).itemsize)
+        stages = "".join(f"{best[stage]*1000:>9.2f}ms" for stage in STAGES)
+        print(f"{name:<13}{stages}{sum(best.values())*1000:>9.2f}ms{storage/1e6:>8.1f}MB"
+              f"{final_err:>10.2e} m{max_err:>10.2e} m")
+
+
+def main(argv):
+    source = argv[0] if argv else str(SAMPLES)
+    smooth = argv[1] if len(argv) > 1 else pos.SMOOTHING
+    engine = argv[2] if len(argv) > 2 else pos.INTEGRATION
+    if(source.isdigit()):
+        t, acc, qua = synthetic_flight(int(source))
+    else:
+        t, acc, qua = load_flight(source)
+    report(t, acc, qua, smooth, engine)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
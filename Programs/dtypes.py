@@ -0,0 +1,64 @@
+# Floating point dtype policy for the numerical pipeline
+#
+# One place decides which dtype sample storage and the vectorized stages use:
+#   storage:    SampleStore sensor columns (the blackbox log is always float32)
+#   compute:    gap filling, smoothing, rotation
+#   accumulate: running sums (cumulative integration, moving average sums)
+# Times are always float64: at float32 a flight time of 1000 s only resolves ~60 us.
+#
+#   "float64": everything in float64 (default, reference)
+#   "float32": float32 storage and compute, float64 accumulation.  Halves the memory
+#              traffic of the array stages; the sensors only give ~4 significant digits
+#   "float32-all": float32 accumulation as well, fastest, loses accuracy on long flights
+#
+# dtype_report.py measures the accuracy against speed of each policy.  Arrays are always
+# converted with as_float(), so None values become NaN and no object arrays are created.
+
+import collections
+import contextlib
+
+Policy = collections.namedtuple("Policy", ["name", "storage", "compute", "accumulate"])
+
+POLICIES = {
+    "float64":     Policy("float64",     "float64", "float64", "float64"),
+    "float32":     Policy("float32",     "float32", "float32", "float64"),
+    "float32-all": Policy("float32-all", "float32", "float32", "float32"),
+}
+
+DEFAULT_POLICY = "float64"
+_policy = POLICIES[DEFAULT_POLICY]
+
+
+def policy():
+    return _policy
+
+
+def set_policy(name):
+    global _policy
+    if(name not in POLICIES):
+        raise ValueError(f"unknown dtype policy {name!r}, one of {tuple(POLICIES)}")
+    _policy = POLICIES[name]
+    return _policy
+
+
+@contextlib.contextmanager
+def using(name):
+    # Temporarily switch the policy (e.g. to compare policies)
+    previous = _policy.name
+    set_policy(name)
+    try:
+        yield _policy
+    finally:
+        set_policy(previous)
+
+
+def as_float(data, dtype=None):
+    '''
+    Float array (compute dtype by default) from a list with None values (-> NaN) or an
+    array; arrays already of that dtype are not copied
+    '''
+    import numpy as np
+    dtype = np.dtype(dtype or _policy.compute)
+    if(isinstance(data, np.ndarray) and data.dtype != object):
+        return data.astype(dtype, copy=False)
+    return np.array(data, dtype=dtype)
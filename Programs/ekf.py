@@ -0,0 +1,181 @@
+# Attitude EKF core for IMUTracker.attitudeTrack (old-position.py)
+#
+# State: quaternion q^nb (w, x, y, z) and its 4x4 covariance P.
+#   Propagation:  q = normalized(F q),  P = F P F' + Q
+#                 F = I + dt/2 Omega(w),  Q = (gyro_noise dt)^2 G G' = (gyro_noise dt)^2/4 (I - q q')
+#   Measurement:  the normalized accelerometer reading against the predicted gravity
+#                 direction normalized(-R(q) gn); the noise grows with | |a| - g0 | so the
+#                 correction fades out under thrust
+#
+# One Python loop over the samples with the quaternion, the covariance (10 unique entries,
+# P is symmetric) and every matrix product unrolled into float locals: no NumPy arrays are
+# built per sample.  The loop only stores the quaternion of each sample in a preallocated
+# flat list; the navigation frame acceleration and orientation are computed from them for
+# all samples at once afterwards.
+
+import dtypes
+
+P0 = 1e-10                  # initial state covariance (times I)
+
+
+def attitude_track(w, a, dt, gn, g0, gyro_noise, acc_noise, update=True):
+    '''
+    Track the orientation and rotate the acceleration into the navigation frame
+    @param w: (N, 3) angular rate, gyro bias removed (rad/s)
+    @param a: (N, 3) acceleration in the body frame
+    @param dt: sample interval (s)
+    @param gn: gravity in the navigation frame (3), the negated mean acceleration at rest
+    @param g0: magnitude of gn
+    @param gyro_noise, acc_noise: sensor noise from IMUTracker.initialize
+    @param update: run the gravity measurement update (False: propagation only)
+    Return: (a_nav, orix, oriy, oriz), (N, 3) arrays: the gravity free acceleration in the
+            navigation frame and the orientation as in attitudeTrack
+    '''
+    import numpy as np
+    # Python floats throughout: NumPy scalars would make every operation below ~10x slower
+    gx, gy, gz = (float(v) for v in np.ravel(gn))
+    g0, dt, acc_noise = float(g0), float(dt), float(acc_noise)
+    half = 0.5*dt
+    q_noise = 0.25*(float(gyro_noise)*dt)**2
+
+    a = np.asarray(a, dtype=np.float64)
+    samples = np.hstack((np.asarray(w, dtype=np.float64), a)).tolist()
+    quats = [0.0]*(4*len(samples))              # quaternion after each sample
+
+    q0, q1, q2, q3 = 1.0, 0.0, 0.0, 0.0
+    p00 = p11 = p22 = p33 = P0
+    p01 = p02 = p03 = p12 = p13 = p23 = 0.0
+
+    for i, (wx, wy, wz, ax, ay, az) in enumerate(samples):
+
+        # ---- 1. propagation ----
+        # q = F q, Q = q_noise (I - q q') with q before the step
+        hx, hy, hz = half*wx, half*wy, half*wz
+        o0, o1, o2, o3 = q0, q1, q2, q3
+        q0 = o0 - hx*o1 - hy*o2 - hz*o3
+        q1 = hx*o0 + o1 + hz*o2 - hy*o3
+        q2 = hy*o0 - hz*o1 + o2 + hx*o3
+        q3 = hz*o0 + hy*o1 - hx*o2 + o3
+        n = (q0*q0 + q1*q1 + q2*q2 + q3*q3)**0.5
+        q0, q1, q2, q3 = q0/n, q1/n, q2/n, q3/n
+
+        # M = F P
+        m00 = p00 - hx*p01 - hy*p02 - hz*p03
+        m01 = p01 - hx*p11 - hy*p12 - hz*p13
+        m02 = p02 - hx*p12 - hy*p22 - hz*p23
+        m03 = p03 - hx*p13 - hy*p23 - hz*p33
+        m10 = hx*p00 + p01 + hz*p02 - hy*p03
+        m11 = hx*p01 + p11 + hz*p12 - hy*p13
+        m12 = hx*p02 + p12 + hz*p22 - hy*p23
+        m13 = hx*p03 + p13 + hz*p23 - hy*p33
+        m20 = hy*p00 - hz*p01 + p02 + hx*p03
+        m21 = hy*p01 - hz*p11 + p12 + hx*p13
+        m22 = hy*p02 - hz*p12 + p22 + hx*p23
+        m23 = hy*p03 - hz*p13 + p23 + hx*p33
+        m30 = hz*p00 + hy*p01 - hx*p02 + p03
+        m31 = hz*p01 + hy*p11 - hx*p12 + p13
+        m32 = hz*p02 + hy*p12 - hx*p22 + p23
+        m33 = hz*p03 + hy*p13 - hx*p23 + p33
+
+        # P = M F' + Q (upper triangle)
+        n0, n1, n2, n3 = q_noise*o0, q_noise*o1, q_noise*o2, q_noise*o3
+        p00 = m00 - hx*m01 - hy*m02 - hz*m03 + q_noise - n0*o0
+        p01 = hx*m00 + m01 + hz*m02 - hy*m03 - n0*o1
+        p02 = hy*m00 - hz*m01 + m02 + hx*m03 - n0*o2
+        p03 = hz*m00 + hy*m01 - hx*m02 + m03 - n0*o3
+        p11 = hx*m10 + m11 + hz*m12 - hy*m13 + q_noise - n1*o1
+        p12 = hy*m10 - hz*m11 + m12 + hx*m13 - n1*o2
+        p13 = hz*m10 + hy*m11 - hx*m12 + m13 - n1*o3
+        p22 = hy*m20 - hz*m21 + m22 + hx*m23 + q_noise - n2*o2
+        p23 = hz*m20 + hy*m21 - hx*m22 + m23 - n2*o3
+        p33 = hz*m30 + hy*m31 - hx*m32 + m33 + q_noise - n3*o3
+
+        # ---- 2. measurement update ----
+        an = (ax*ax + ay*ay + az*az)**0.5
+        if(update and an > 0):
+            # D = half the derivative of R(q) gn by q (4 distinct entries), R(q) gn = D q
+            d0 = q0*gx + q3*gy - q2*gz
+            d1 = q1*gx + q2*gy + q3*gz
+            d2 = -q2*gx + q1*gy - q0*gz
+            d3 = -q3*gx + q0*gy + q1*gz
+
+            # predicted gravity direction -R gn / |R gn| and the residual
+            rx = d0*q0 + d1*q1 + d2*q2 + d3*q3
+            ry = d3*q0 - d2*q1 + d1*q2 - d0*q3
+            rz = -d2*q0 - d3*q1 + d0*q2 + d1*q3
+            rn = (rx*rx + ry*ry + rz*rz)**0.5
+            e0, e1, e2 = ax/an + rx/rn, ay/an + ry/rn, az/an + rz/rn
+
+            # sensor noise: internal + external (acceleration other than gravity)
+            noise = (acc_noise/an)**2 + (1 - g0/an)**2
+
+            # H = d(-R gn / |R gn|)/dq = -2/|R gn| D, rows
+            #   (h0, h1, h2, h3), (h3, -h2, h1, -h0), (-h2, -h3, h0, h1)
+            k = -2/rn
+            h0, h1, h2, h3 = k*d0, k*d1, k*d2, k*d3
+
+            # R is diagonal: one scalar update per axis gives the same result as the 3x3
+            # update without inverting S.  Each axis: u = P h', s = h u + noise,
+            # q += u (e - h (q - q_predicted))/s, P -= u u'/s
+            x0 = x1 = x2 = x3 = 0.0                 # correction of q so far
+
+            # axis x: h = (h0, h1, h2, h3)
+            u0 = p00*h0 + p01*h1 + p02*h2 + p03*h3
+            u1 = p01*h0 + p11*h1 + p12*h2 + p13*h3
+            u2 = p02*h0 + p12*h1 + p22*h2 + p23*h3
+            u3 = p03*h0 + p13*h1 + p23*h2 + p33*h3
+            g = 1/(h0*u0 + h1*u1 + h2*u2 + h3*u3 + noise)
+            r = g*e0
+            x0, x1, x2, x3 = u0*r, u1*r, u2*r, u3*r
+            v0, v1, v2, v3 = g*u0, g*u1, g*u2, g*u3
+            p00, p01, p02, p03 = p00 - v0*u0, p01 - v0*u1, p02 - v0*u2, p03 - v0*u3
+            p11, p12, p13 = p11 - v1*u1, p12 - v1*u2, p13 - v1*u3
+            p22, p23, p33 = p22 - v2*u2, p23 - v2*u3, p33 - v3*u3
+
+            # axis y: h = (h3, -h2, h1, -h0)
+            u0 = p00*h3 - p01*h2 + p02*h1 - p03*h0
+            u1 = p01*h3 - p11*h2 + p12*h1 - p13*h0
+            u2 = p02*h3 - p12*h2 + p22*h1 - p23*h0
+            u3 = p03*h3 - p13*h2 + p23*h1 - p33*h0
+            g = 1/(h3*u0 - h2*u1 + h1*u2 - h0*u3 + noise)
+            r = g*(e1 - (h3*x0 - h2*x1 + h1*x2 - h0*x3))
+            x0, x1, x2, x3 = x0 + u0*r, x1 + u1*r, x2 + u2*r, x3 + u3*r
+            v0, v1, v2, v3 = g*u0, g*u1, g*u2, g*u3
+            p00, p01, p02, p03 = p00 - v0*u0, p01 - v0*u1, p02 - v0*u2, p03 - v0*u3
+            p11, p12, p13 = p11 - v1*u1, p12 - v1*u2, p13 - v1*u3
+            p22, p23, p33 = p22 - v2*u2, p23 - v2*u3, p33 - v3*u3
+
+            # axis z: h = (-h2, -h3, h0, h1)
+            u0 = -p00*h2 - p01*h3 + p02*h0 + p03*h1
+            u1 = -p01*h2 - p11*h3 + p12*h0 + p13*h1
+            u2 = -p02*h2 - p12*h3 + p22*h0 + p23*h1
+            u3 = -p03*h2 - p13*h3 + p23*h0 + p33*h1
+            g = 1/(-h2*u0 - h3*u1 + h0*u2 + h1*u3 + noise)
+            r = g*(e2 - (-h2*x0 - h3*x1 + h0*x2 + h1*x3))
+            q0, q1, q2, q3 = q0 + x0 + u0*r, q1 + x1 + u1*r, q2 + x2 + u2*r, q3 + x3 + u3*r
+            v0, v1, v2, v3 = g*u0, g*u1, g*u2, g*u3
+            p00, p01, p02, p03 = p00 - v0*u0, p01 - v0*u1, p02 - v0*u2, p03 - v0*u3
+            p11, p12, p13 = p11 - v1*u1, p12 - v1*u2, p13 - v1*u3
+            p22, p23, p33 = p22 - v2*u2, p23 - v2*u3, p33 - v3*u3
+
+            # ---- 3. post correction ----
+            n = (q0*q0 + q1*q1 + q2*q2 + q3*q3)**0.5
+            q0, q1, q2, q3 = q0/n, q1/n, q2/n, q3/n
+
+        quats[4*i:4*i + 4] = (q0, q1, q2, q3)
+
+    # ---- 4. navigation frame acceleration (R' a + gn) and orientation (rows of R) ----
+    # all samples at once from the stored quaternions, R(q) rotating nav to body frame
+    q0, q1, q2, q3 = np.array(quats, dtype=np.float64).reshape(-1, 4).T
+    ww, xx, yy, zz = q0*q0, q1*q1, q2*q2, q3*q3
+    wx, wy, wz = q0*q1, q0*q2, q0*q3
+    xy, xz, yz = q1*q2, q1*q3, q2*q3
+    R = np.empty((len(q0), 3, 3))
+    R[:, 0, 0], R[:, 0, 1], R[:, 0, 2] = ww + xx - yy - zz, 2*(xy + wz), 2*(xz - wy)
+    R[:, 1, 0], R[:, 1, 1], R[:, 1, 2] = 2*(xy - wz), ww - xx + yy - zz, 2*(yz + wx)
+    R[:, 2, 0], R[:, 2, 1], R[:, 2, 2] = 2*(xz + wy), 2*(yz - wx), ww - xx - yy + zz
+    a_nav = np.einsum("nji,nj->ni", R, a) + (gx, gy, gz)
+
+    dtype = dtypes.policy().compute
+    return (a_nav.astype(dtype, copy=False), R[:, 0].astype(dtype), R[:, 1].astype(dtype),
+            R[:, 2].astype(dtype))
@@ -0,0 +1,134 @@
+# Packed binary telemetry frames (payload <-> ground station)
+#
+# Frame:  header | body | crc16
+#   header  '<BBHBf'  magic, type, sequence number, count, base time (s since launch)
+#   body    SAMPLES:  'count' samples of '<H3h4h'
+#                       dt from base time (ms), acc xyz (0.01 m/s^2), quaternion wxyz (1/2^14)
+#           EVENT:    utf-8 text ('count' bytes), e.g. LAUNCH, LANDED, KEY:<grid>
+#   crc16   CRC-CCITT over header+body (binascii.crc_hqx)
+#
+# A sample is 16 bytes instead of a ~20 byte string per packet, so one RFM9x packet
+# (252 byte payload) carries 15 samples.  Missing (None) values are sent as MISSING.
+
+import binascii
+import struct
+
+MAGIC = 0xA7
+TYPE_SAMPLES = 1
+TYPE_EVENT = 2
+
+MAX_PAYLOAD = 252                   # RFM9x max payload (bytes)
+HEADER = struct.Struct("<BBHBf")
+SAMPLE = struct.Struct("<H3h4h")
+CRC = struct.Struct("<H")
+SAMPLES_PER_FRAME = (MAX_PAYLOAD - HEADER.size - CRC.size)//SAMPLE.size
+
+ACC_SCALE = 100                     # counts per m/s^2
+QUA_SCALE = 1 << 14                 # counts per unit (BNO055 native scale)
+MISSING = -32768
+
+
+def _fixed(value, scale):
+    if(value is None or value != value):   # None or NaN
+        return MISSING
+    return max(-32767, min(32767, round(value*scale)))
+
+
+def _float(count, scale):
+    return None if count == MISSING else count/scale
+
+
+def _seal(frame_type, seq, count, base_time, body):
+    packet = HEADER.pack(MAGIC, frame_type, seq & 0xFFFF, count, base_time) + body
+    return packet + CRC.pack(binascii.crc_hqx(packet, 0xFFFF))
+
+
+class FrameEncoder:
+
+    def __init__(self, samples_per_frame=SAMPLES_PER_FRAME, decimation=1):
+        '''
+        @param samples_per_frame: samples batched into each frame (max SAMPLES_PER_FRAME)
+        @param decimation: keep one of every n samples passed to add()
+        '''
+        if(not 0 < samples_per_frame <= SAMPLES_PER_FRAME):
+            raise ValueError(f"samples_per_frame must be in 1..{SAMPLES_PER_FRAME}")
+        self.samples_per_frame = samples_per_frame
+        self.decimation = decimation
+        self.seq = 0
+        self._calls = 0
+        self._body = bytearray(samples_per_frame*SAMPLE.size)
+        self._count = 0
+        self._base = 0.0
+
+    def _next_seq(self):
+        seq = self.seq
+        self.seq = (self.seq + 1) & 0xFFFF
+        return seq
+
+    def add(self, t, acc, qua):
+        '''
+        Add one sample, returns a finished frame (bytes) when the batch is full, else None
+        '''
+        self._calls += 1
+        if((self._calls - 1) % self.decimation):
+            return None
+        if(self._count == 0):
+            self._base = t
+        acc = acc or (None, None, None)
+        qua = qua or (None, None, None, None)
+        SAMPLE.pack_into(self._body, self._count*SAMPLE.size,
+                         min(0xFFFF, max(0, round((t - self._base)*1000))),
+                         _fixed(acc[0], ACC_SCALE), _fixed(acc[1], ACC_SCALE), _fixed(acc[2], ACC_SCALE),
+                         _fixed(qua[0], QUA_SCALE), _fixed(qua[1], QUA_SCALE),
+                         _fixed(qua[2], QUA_SCALE), _fixed(qua[3], QUA_SCALE))
+        self._count += 1
+        if(self._count == self.samples_per_frame):
+            return self.flush()
+        return None
+
+    def flush(self):
+        # Seal whatever samples are buffered (None if there are none)
+        if(self._count == 0):
+            return None
+        frame = _seal(TYPE_SAMPLES, self._next_seq(), self._count, self._base,
+                      bytes(self._body[:self._count*SAMPLE.size]))
+        self._count = 0
+        return frame
+
+    def event(self, text, t=0.0):
+        body = text.encode("utf-8")[:MAX_PAYLOAD - HEADER.size - CRC.size]
+        return _seal(TYPE_EVENT, self._next_seq(), len(body), t, body)
+
+
+def is_frame(packet):
+    return len(packet) >= HEADER.size + CRC.size and packet[0] == MAGIC
+
+
+def decode_frame(packet):
+    '''
+    Decode one frame.  Raises ValueError on a bad checksum or malformed frame.
+
+    Return: (type, seq, base_time, payload)
+        payload is a list of (t, (ax, ay, az), (qw, qx, qy, qz)) for TYPE_SAMPLES,
+        or the event text for TYPE_EVENT
+    '''
+    packet = bytes(packet)
+    if(not is_frame(packet)):
+        raise ValueError("not a telemetry frame")
+    body_end = len(packet) - CRC.size
+    (crc,) = CRC.unpack_from(packet, body_end)
+    if(binascii.crc_hqx(packet[:body_end], 0xFFFF) != crc):
+        raise ValueError("bad frame checksum")
+
+    _, frame_type, seq, count, base_time = HEADER.unpack_from(packet)
+    if(frame_type == TYPE_EVENT):
+        return frame_type, seq, base_time, packet[HEADER.size:HEADER.size + count].decode("utf-8")
+    if(frame_type != TYPE_SAMPLES or HEADER.size + count*SAMPLE.size != body_end):
+        raise ValueError(f"malformed frame (type {frame_type}, count {count})")
+
+    samples = []
+    for s in SAMPLE.iter_unpack(packet[HEADER.size:body_end]):
+        samples.append((base_time + s[0]/1000,
+                        tuple(_float(v, ACC_SCALE) for v in s[1:4]),
+                        tuple(_float(v, QUA_SCALE) for v in s[4:8])))
+    return frame_type, seq, base_time, samples
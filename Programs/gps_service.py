@@ -0,0 +1,93 @@
+# Background GPS reader
+#
+# A worker thread keeps calling gps.update() to parse NMEA sentences and caches the most
+# recent fix with the time it was taken and its dilution of precision.  The sampling
+# loops read the cache without blocking (latest()/coord()), and setup can wait for a
+# first fix with a wall-clock timeout (wait_for_fix()).
+# The GPS and IMU share the I2C bus; bus access is serialized by the bus lock in Blinka.
+#
+# The worker paces itself on wall time, while fixes are stamped with the injected clock.
+# Under a replay's virtual clock the two drift apart (seconds of flight pass between two
+# worker polls), so latest(max_age) polls the GPS itself when the cached fix is too old
+# instead of reporting no fix.
+
+import collections
+import threading
+import time
+
+Fix = collections.namedtuple("Fix", ["latitude", "longitude", "timestamp", "hdop", "pdop", "satellites", "altitude"])
+
+
+class GPSService:
+
+    def __init__(self, gps, interval=0.1, clock=time.monotonic):
+        '''
+        @param gps: adafruit_gps GPS object (or devices.SimGPS)
+        @param interval: seconds between gps.update() calls (at least 2x the NMEA rate)
+        @param clock: time source used to timestamp fixes
+        '''
+        self.gps = gps
+        self.interval = interval
+        self.clock = clock
+        self.updates = 0
+        self.errors = 0
+        self._fix = None
+        self._lock = threading.Lock()   # One gps.update() at a time (worker or a stale latest())
+        self._has_fix = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="gps", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if(self._thread.is_alive()):
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll()
+            self._stop.wait(self.interval)
+
+    def poll(self):
+        # One gps.update(), caches the fix if there is one
+        with self._lock:
+            try:
+                self.gps.update()
+                self.updates += 1
+                if(self.gps.has_fix and self.gps.latitude is not None):
+                    gps = self.gps
+                    self._fix = Fix(gps.latitude, gps.longitude, self.clock(),
+                                    getattr(gps, "hdop", None), getattr(gps, "pdop", None),
+                                    getattr(gps, "satellites", None), getattr(gps, "altitude_m", None))
+                    self._has_fix.set()
+            except (OSError, RuntimeError, ValueError):
+                # Bad sentence or bus error, try again next interval
+                self.errors += 1
+
+    def _stale(self, fix, max_age):
+        return fix is None or (max_age is not None and self.clock() - fix.timestamp > max_age)
+
+    def latest(self, max_age=None):
+        # Most recent Fix (None if there is none, or it is older than max_age seconds).
+        # A missing or too old fix is polled for once more before giving up, so this call
+        # can block for one gps.update() (without max_age it never blocks).
+        fix = self._fix
+        if(max_age is not None and self._stale(fix, max_age)):
+            self.poll()
+            fix = self._fix
+        if(self._stale(fix, max_age)):
+            return None
+        return fix
+
+    def coord(self, max_age=None):
+        # (lat, lon) of the most recent fix, like the old acquire_gps()
+        fix = self.latest(max_age)
+        return None if fix is None else (fix.latitude, fix.longitude)
+
+    def wait_for_fix(self, timeout):
+        # Block until the first fix or 'timeout' wall-clock seconds, returns the Fix or None
+        self._has_fix.wait(timeout)
+        return self._fix
@@ -0,0 +1,74 @@
+# Import-time report for the flight programs
+#
+# Runs "python -X importtime -c 'import <module>'" in a fresh interpreter for each module
+# and reports its own cumulative import time, the total interpreter start, and which heavy
+# packages (NumPy, SciPy, hardware libraries) were loaded by the import.  The flight
+# modules must not load any of them at import: NumPy is loaded when the sample store is
+# created during setup, SciPy only by post-flight computation, and the hardware
+# libraries by devices.open_hardware().
+#
+# usage: python import_report.py [budget_ms] [module ...]
+# Exits with status 1 if a module is over budget or loads a heavy package at import.
+
+import os
+import subprocess
+import sys
+import time
+
+BUDGET_MS = 150                 # (ms) per-module import budget on the Pi
+MODULES = ("mission_main", "position", "replay", "devices", "blackbox", "telemetry",
+           "calibration", "bno055_burst")
+HEAVY = ("numpy", "scipy", "board", "busio", "digitalio", "adafruit_bno055", "adafruit_gps",
+         "adafruit_rfm9x", "turtle")
+
+
+def measure(module, python=sys.executable, cwd=None):
+    '''
+    Import 'module' in a fresh interpreter
+    Return: (module import time in ms, wall time of the interpreter in ms, heavy packages loaded)
+    '''
+    cwd = cwd or os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    result = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=cwd, capture_output=True, text=True)
+    wall = (time.perf_counter() - start)*1000
+    if(result.returncode != 0):
+        raise ImportError(f"import {module} failed:\n{result.stderr.strip()}")
+
+    # Lines are "import time: self [us] | cumulative | imported package"
+    own = None
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if(not line.startswith("import time:") or "|" not in line):
+            continue
+        fields = line[len("import time:"):].split("|")
+        name = fields[2].strip()
+        if(name.split(".")[0] in HEAVY):
+            loaded.add(name.split(".")[0])
+        if(name == module):
+            own = int(fields[1])/1000
+    return own or 0.0, wall, sorted(loaded)
+
+
+def report(modules=MODULES, budget_ms=BUDGET_MS):
+    # Print one line per module, return True if all are within budget with no heavy imports
+    ok = True
+    print(f"{'module':<16}{'import':>10}{'process':>10}  heavy")
+    for module in modules:
+        own, wall, loaded = measure(module)
+        over = own > budget_ms
+        ok = ok and not over and not loaded
+        flag = " OVER BUDGET" if over else ""
+        print(f"{module:<16}{own:>8.1f}ms{wall:>8.1f}ms  {','.join(loaded) or '-'}{flag}")
+    print(f"budget: {budget_ms} ms per module")
+    return ok
+
+
+def main(argv):
+    budget = float(argv[0]) if argv else BUDGET_MS
+    modules = argv[1:] or MODULES
+    return 0 if report(modules, budget) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
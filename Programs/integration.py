@@ -0,0 +1,173 @@
+# Cumulative integration engines for post-flight position reconstruction
+#
+# All engines integrate (N, M) samples along axis 0 on a possibly non-uniform time grid
+# (the sample rate changes between flight phases) and return the running integral (N, M)
+# starting at 0, with whole-array NumPy operations only.
+#   "trapezoid": piecewise linear, error O(h^2)
+#   "simpson":   piecewise quadratic through each interval and its neighbour, error O(h^3)
+#   "romberg":   trapezoid plus one Richardson extrapolation against the trapezoid on every
+#                other sample, error O(h^4) on a uniform grid
+# Error estimates compare a result with the same engine run on every other sample
+# (Richardson): err ~ |I(h) - I(2h)| / (2^p - 1).  The orders p in ORDERS only hold on a
+# uniform grid; the sample times are jittery wake times and the rate changes between
+# phases, so on any other grid only the trapezoid's p = 2 is assumed (the Romberg
+# correction in particular loses its order there).
+#
+# Products are formed in the compute dtype and running sums kept in the accumulate dtype of
+# the dtype policy (dtypes.py); times are float64.
+#
+# Drift correction: the payload is at rest at launch and at landing, so any velocity left
+# at the end of the flight is integrated sensor bias.  With 'zero_end_velocity' a constant
+# acceleration bias is removed so that the velocity is 0 at the last sample, before the
+# position is integrated.
+
+import collections
+
+import dtypes
+
+ORDERS = {"trapezoid": 2, "simpson": 3, "romberg": 4}     # on a uniform grid
+UNIFORM_TOLERANCE = 1e-6    # relative spread of the sample intervals still taken as a uniform grid
+
+IntegrationResult = collections.namedtuple("IntegrationResult", [
+    "velocity",             # (N, M)
+    "position",             # (N, M)
+    "velocity_error",       # (M) estimated discretization error of the final velocity
+    "position_error",       # (M) estimated discretization error of the final position
+    "bias",                 # (M) acceleration bias removed by the drift correction (0 without)
+])
+
+
+def _prepare(f, t):
+    import numpy as np
+    f = dtypes.as_float(f)
+    if(f.ndim == 1):
+        f = f[:, None]
+    t = np.asarray(t, dtype=np.float64)
+    return f, t
+
+
+def _running(steps):
+    # Running sum of the interval integrals, starting at 0
+    import numpy as np
+    dtype = dtypes.policy().accumulate
+    out = np.zeros((len(steps) + 1, steps.shape[1]), dtype=dtype)
+    np.cumsum(steps, axis=0, dtype=dtype, out=out[1:])
+    return out
+
+
+def trapezoid(f, t):
+    f, t = _prepare(f, t)
+    if(len(f) < 2):
+        return _running(f[:0])
+    h = (t[1:] - t[:-1]).astype(f.dtype)[:, None]
+    return _running(0.5*(f[1:] + f[:-1])*h)
+
+
+def simpson(f, t):
+    '''
+    Interval [t(i), t(i+1)] integrates the parabola through it and its left neighbour
+    sample (the right one for the first interval); exact for quadratics on any grid
+    '''
+    import numpy as np
+    f, t = _prepare(f, t)
+    if(len(f) < 3):
+        return trapezoid(f, t)
+    h = np.diff(t).astype(f.dtype)[:, None]
+    steps = np.empty((len(f) - 1, f.shape[1]), dtype=f.dtype)
+
+    # Intervals 1..N-2: points i-1, i, i+1, integrate over [t(i), t(i+1)]
+    h1, h2 = h[:-1], h[1:]
+    w0 = -h2**3/(6*h1*(h1 + h2))
+    w2 = h2*(3*h1 + 2*h2)/(6*(h1 + h2))
+    w1 = h2 - w0 - w2
+    steps[1:] = w0*f[:-2] + w1*f[1:-1] + w2*f[2:]
+
+    # First interval: points 0, 1, 2, integrate over [t(0), t(1)]
+    h1, h2 = h[0], h[1]
+    u2 = -h1**3/(6*h2*(h1 + h2))
+    u0 = h1*(2*h1 + 3*h2)/(6*(h1 + h2))
+    u1 = h1 - u0 - u2
+    steps[0] = u0*f[0] + u1*f[1] + u2*f[2]
+    return _running(steps)
+
+
+def romberg(f, t):
+    '''
+    Trapezoid with one Richardson step: at even samples (4 T(h) - T(2h))/3, the
+    correction is interpolated in between
+    '''
+    import numpy as np
+    f, t = _prepare(f, t)
+    fine = trapezoid(f, t)
+    if(len(f) < 3):
+        return fine
+    coarse = trapezoid(f[::2], t[::2])
+    correction = (fine[::2] - coarse)/3
+    t_even = t[::2]
+    for axis in range(f.shape[1]):
+        fine[:, axis] += np.interp(t, t_even, correction[:, axis])
+    return fine
+
+
+ENGINES = {
+    "trapezoid": trapezoid,
+    "simpson": simpson,
+    "romberg": romberg,
+}
+
+
+def cumulative(f, t, engine="trapezoid"):
+    if(engine not in ENGINES):
+        raise ValueError(f"unknown integration engine {engine!r}, one of {tuple(ENGINES)}")
+    return ENGINES[engine](f, t)
+
+
+def _uniform(t):
+    import numpy as np
+    h = np.diff(t)
+    return h.max() - h.min() <= UNIFORM_TOLERANCE*abs(np.median(h))
+
+
+def error_estimate(f, t, engine="trapezoid", result=None):
+    '''
+    Estimated discretization error of the final value of cumulative(f, t, engine), per axis
+    '''
+    import numpy as np
+    f, t = _prepare(f, t)
+    if(len(f) < 5):
+        return np.zeros(f.shape[1])
+    if(result is None):
+        result = cumulative(f, t, engine)
+    last = (len(f) - 1)//2*2                        # last sample on the coarse grid
+    coarse = cumulative(f[:last + 1:2], t[:last + 1:2], engine)
+    order = ORDERS[engine] if _uniform(t) else ORDERS["trapezoid"]
+    error = np.abs(result[last] - coarse[-1])/(2**order - 1)
+    if(last < len(f) - 1):
+        # The last sample is not on the coarse grid: add the error of the last interval
+        # against the parabola through the last three samples (Simpson, run backwards)
+        tail = -simpson(f[:-4:-1], t[:-4:-1])[1]
+        error = error + np.abs(result[-1] - result[-2] - tail)
+    return error
+
+
+def integrate_twice(acc, t, engine="trapezoid", zero_end_velocity=False):
+    '''
+    Velocity and position from acceleration (N, M) sampled at times t (N)
+    @param engine: name in ENGINES
+    @param zero_end_velocity: remove a constant acceleration bias so the final velocity is 0
+    Return: IntegrationResult
+    '''
+    import numpy as np
+    acc, t = _prepare(acc, t)
+    velocity = cumulative(acc, t, engine)
+    velocity_error = error_estimate(acc, t, engine, velocity)
+
+    bias = np.zeros(acc.shape[1])
+    if(zero_end_velocity and len(t) > 1 and t[-1] > t[0]):
+        # Constant bias b integrates to b*(t - t0) of velocity
+        bias = velocity[-1]/(t[-1] - t[0])
+        velocity = velocity - (t - t[0])[:, None]*bias
+
+    position = cumulative(velocity, t, engine)
+    position_error = error_estimate(velocity, t, engine, position)
+    return IntegrationResult(velocity, position, velocity_error, position_error, bias)
@@ -0,0 +1,86 @@
+# Streaming position integration
+#
+# Updates velocity and position with every in-flight sample, so the displacement is
+# already known when landing is detected and the post-flight phase takes constant time.
+# Each linear acceleration sample is rotated from the body frame into the navigation frame
+# with the BNO055 quaternion (w, x, y, z), then integrated twice with the trapezoidal rule
+# using the actual time step between samples.  Pure Python scalar math: no per-sample
+# NumPy allocations.
+
+import collections
+import math
+
+IntegratorState = collections.namedtuple("IntegratorState", ["t", "acc", "velocity", "position", "qua", "samples", "gaps"])
+
+
+def rotate_to_nav(qua, acc):
+    '''
+    Rotate a body frame vector into the navigation frame, v' = R(q) v
+    Same as scipy Rotation.from_quat((x, y, z, w)).as_matrix() @ v (q is normalized first)
+    '''
+    w, x, y, z = qua
+    norm = math.sqrt(w*w + x*x + y*y + z*z)
+    if(norm == 0):
+        return acc[0], acc[1], acc[2]
+    w /= norm; x /= norm; y /= norm; z /= norm
+    ax, ay, az = acc
+    return ((1 - 2*(y*y + z*z))*ax + 2*(x*y - w*z)*ay + 2*(x*z + w*y)*az,
+            2*(x*y + w*z)*ax + (1 - 2*(x*x + z*z))*ay + 2*(y*z - w*x)*az,
+            2*(x*z - w*y)*ax + 2*(y*z + w*x)*ay + (1 - 2*(x*x + y*y))*az)
+
+
+class StreamingIntegrator:
+
+    def __init__(self, rotate=True):
+        '''
+        @param rotate: rotate samples into the navigation frame (False integrates the body frame)
+        '''
+        self.rotate = rotate
+        self.reset()
+
+    def reset(self):
+        self.t = None
+        self.acc = (0.0, 0.0, 0.0)          # last navigation frame acceleration
+        self.velocity = [0.0, 0.0, 0.0]
+        self.position = [0.0, 0.0, 0.0]
+        self.samples = 0
+        self.gaps = 0                       # samples with None values (previous value held)
+        self._qua = (1.0, 0.0, 0.0, 0.0)
+
+    def state(self):
+        # Snapshot for checkpoints (checkpoint.py), restore() continues from it
+        return IntegratorState(self.t, tuple(self.acc), tuple(self.velocity), tuple(self.position),
+                               tuple(self._qua), self.samples, self.gaps)
+
+    def restore(self, state):
+        self.t = state.t
+        self.acc = tuple(state.acc)
+        self.velocity = list(state.velocity)
+        self.position = list(state.position)
+        self._qua = tuple(state.qua)
+        self.samples = state.samples
+        self.gaps = state.gaps
+
+    def update(self, t, acc, qua):
+        # Missing values hold the last good reading
+        if(qua is None or None in qua):
+            self.gaps += 1
+            qua = self._qua
+        else:
+            self._qua = qua
+        if(acc is None or None in acc):
+            self.gaps += 1
+            a = self.acc
+        else:
+            a = rotate_to_nav(qua, acc) if self.rotate else (acc[0], acc[1], acc[2])
+
+        if(self.t is not None):
+            dt = t - self.t
+            v, p, a0 = self.velocity, self.position, self.acc
+            for axis in range(3):
+                v_prev = v[axis]
+                v[axis] = v_prev + 0.5*(a0[axis] + a[axis])*dt
+                p[axis] += 0.5*(v_prev + v[axis])*dt
+        self.t = t
+        self.acc = a
+        self.samples += 1
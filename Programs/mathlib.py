@@ -2,14 +2,15 @@ import math
 import numpy as np
 from numpy.linalg import norm
 import scipy.signal
+import dtypes
 
 
 def I(n):
     '''
     unit matrix
-    just making its name prettier than np.eye
+    just making its name prettier than np.eye (compute dtype of the dtype policy)
     '''
-    return np.eye(n)
+    return np.eye(n, dtype=dtypes.policy().compute)
 
 
 def normalized(x):
@@ -99,8 +100,8 @@ def filtSignal(data, dt=0.01, wn=10, btype='lowpass', order=1):
     res = []
     n, s = scipy.signal.butter(order, wn, fs=1 / dt, btype=btype)
     for d in data:
-        d = scipy.signal.filtfilt(n, s, d, axis=0)
-        res.append(d)
+        d = dtypes.as_float(d)
+        res.append(scipy.signal.filtfilt(n, s, d, axis=0).astype(d.dtype, copy=False))
     return res
 
 def quat_to_euler(w, x, y, z):
@@ -1,214 +1,333 @@
 import os
 import time
+import signal
 import datetime
-from turtle import position
-
-# Board
-import board
-import busio
-from digitalio import DigitalInOut
-
-# Adafruit libraries
-import adafruit_gps
-import adafruit_bno055
-import adafruit_rfm9x
 
 # External file imports
 import position as pos  # IMU tracking
 import grid             # Gridding
+import devices          # Hardware / simulated sensors and radio
+from scheduler import RateScheduler
+from ringbuffer import RollingWindow
+from blackbox import BlackboxWriter, AsyncBlackbox, FLAG_PHASE_SHIFT, iter_records
+from telemetry import Telemetry
+from frames import FrameEncoder
+from samplestore import SampleStore
+from integrator import StreamingIntegrator
+from gps_service import GPSService
+from bno055_burst import make_reader
+from phases import PHASES, BY_CODE, describe, format_policy
+import calibration      # Saved BNO055 calibration profiles
+import checkpoint       # Mission state checkpoints (resume after a restart)
+from profiler import StageProfiler
 
 THE_COEFFICIENT = 36
 
-def acquire_gps(gps, timeout):
-    timecount = 0
-    while not gps.has_fix:
-        gps.update()
-        timecount += 1
-        if(timecount >= timeout):
-            return None
-    return (gps.latitude, gps.longitude)
+GPS_MAX_AGE = 5                  # (seconds) Oldest cached fix accepted as the landing coordinate
+KEY_FLUSH_TIMEOUT = 10           # (seconds) Longest wait for a KEY message to go out before reporting a stall
 
 
-def calibrate_gps(gps):
-    if(acquire_gps(gps, 300)):
+def calibrate_gps(gps_service, timeout):
+    if(gps_service.wait_for_fix(timeout)):
         print(f"Acquired.")
     else:
         print(f"Did not acquire. Retry if necessary.")
 
 
-def calibrate_imu(imu):
-    while(imu.calibration_status[1] != 3 or imu.calibration_status[2] != 3):
-        pass
-
-def average_window(list, window):
-    if(not list):
-        return 0
-    return sum(map(lambda acc: abs(acc), list[-window:]))/window
+def dump_latency(profiler, telemetry):
+    # Print the full histograms and send one summary line per phase
+    print(f"Latency histograms:\n{profiler.format_table()}")
+    for line in profiler.summaries():
+        telemetry.event(line)
 
 
-def setup_rf(spi, CS, RESET, FREQ):
-    while True:
-        # Attempt setting up RFM9x Module
-        try:
-            rfm9x = adafruit_rfm9x.RFM9x(spi, CS, RESET, FREQ)
-            rfm9x.tx_power = 23
-            print('RFM9x SET\n')
-            return rfm9x
-
-        except RuntimeError as error:
-            print('RFM9 ERR: Check wiring\n')
-
-def transmit_rf(rfm9x, string, count=1):
-    while count > 0:
-        tx_data = bytes(string, 'utf-8')
-        rfm9x.send(tx_data)
-        count -= 1
-
-
-# Main payload routine
-def main():
-    i2c = board.I2C()
-
-    # GPS
-    gps = adafruit_gps.GPS_GtopI2C(i2c, debug=False)
-    gps.send_command(b"PMTK314,0,1,0,1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0")
-    gps.send_command(b"PMTK220,1000")
-
-    # IMU
-    imu = adafruit_bno055.BNO055_I2C(i2c)
-    imu.mode = adafruit_bno055.IMUPLUS_MODE     # NO MAGNETOMETER MODE
-    imu.accel_range = adafruit_bno055.ACCEL_16G
-
-    # RF
-    # Configure radio frequencies
-    rf_channel = 7
-    rf_freq = 434.550 + rf_channel * 0.1
-    CS = DigitalInOut(board.CE1)
-    RESET = DigitalInOut(board.D25)
-    spi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)
-    rfm9x = setup_rf(spi, CS, RESET, rf_freq)
-
-    # Attempt GPS acquisition routine
+def calibrate_imu(imu, profile_path, in_flight=False):
+    # Restore the saved offsets if the sensor accepts them, else full calibration (and save)
+    # In flight (resume) the offsets are restored without waiting for validation
+    if(in_flight):
+        report = calibration.resume_calibration(imu, profile_path)
+    else:
+        report = calibration.startup_calibration(imu, profile_path)
+    print(f"IMU calibration: {calibration.format_report(report)}")
+    return report
+
+
+def reload_flight(path, samples, integrator):
+    # Resume: integrate the samples logged after the checkpoint, and reload all logged
+    # samples into 'samples' if there is a sample store (None: post-flight refine is off)
+    count = 0
+    for t, acc, gyr, qua, flags in iter_records(path):
+        if(samples is not None):
+            samples.append(t, acc, qua, gyr)
+        if(integrator.t is None or t > integrator.t):
+            integrator.update(t, acc, qua)
+        count += 1
+    return count
+
+
+# Mission routine from setup to the grid number
+# 'clock'/'sleep' drive the sample scheduler (a virtual clock replays faster than real time)
+# 'refine' recomputes the position post-flight with pos.acc_to_pos (Simpson, zero velocity
+# at landing) instead of using the streaming integrator's result
+# 'gps_timeout' is how long (wall clock seconds) setup waits for a first GPS fix
+# 'resume' continues an interrupted flight from the checkpoint in 'out_dir' if there is one
+# (skips standby, appends to the blackbox log)
+# Returns a summary dict with detection times, grid number and per-stage wall time
+def run_mission(dev, telemetry, clock=time.monotonic, sleep=time.sleep, out_dir=".", refine=False, gps_timeout=30.0, resume=False):
+    imu = dev.imu
+    gps_service = GPSService(dev.gps, clock=clock).start()   # Keeps the latest fix cached in the background
+    stage_time = {}                  # (seconds, wall clock) spent in each mission stage
+    time_stage = time.perf_counter()
+
+    # Checkpoint of an interrupted flight
+    PATH_CHECKPOINT = os.path.join(out_dir, checkpoint.CHECKPOINT_FILE)
+    state = checkpoint.load(PATH_CHECKPOINT) if resume else None
+    if(state is not None and state.phase not in BY_CODE):
+        state = None
+    if(state is not None):
+        print(f"Resuming flight in phase {BY_CODE[state.phase].name} at t+{state.time_flight:.2f} s")
+
+    # Attempt GPS acquisition routine (in flight there is no time to wait for a fix)
     print("Acquiring GPS fix...")
-    calibrate_gps(gps)
+    calibrate_gps(gps_service, gps_timeout if state is None else 0)
     
     # IMU calibration routine
     print("Calibrating IMU...")
-    calibrate_imu(imu)
+    calibration_report = calibrate_imu(imu, os.path.join(out_dir, calibration.PROFILE_FILE), state is not None)
     print("Calibrated!")
     
 
     # Declarations
-    time_lastSample = time.time()
-    FREQUENCY = 1/100                # (in seconds)
+    print(f"Sampling policy:\n{format_policy()}")
+    phase_log = []                   # (phase name, time entered) for the summary
 
-    hasLaunched = False              # Boolean that indicates initial rapid acceleration was detected (launched)
+    hasLaunched = state is not None  # Boolean that indicates initial rapid acceleration was detected (launched)
     hasLanded   = False              # Boolean that indicates no acceleration IF hasLaunched is true  (landed)
 
-    acc_accumulator  = []            # List that accumulates acceleration values to apply a rolling mean
-    motionless_count = 0             # Counter for number of cycles where no motion is detected, resets on movement (determines landing)
+    ACC_WINDOW_TIME = 0.5            # (seconds) Range of values to apply rolling average in 'acc_window'
+    time_stillSince = None           # Start of the current motionless stretch, resets on movement (determines landing)
 
-    ACC_WINDOW = 50                  # Range of values to apply rolling average in 'acc_accumulator'
     MIN_IMU_TIME = 0.5               # (seconds) Minimum time IMU should collect data to prevent immediate landing event detection
     MOTION_SENSITIVITY = 3           # Amount of 3-axis acceleration needed to be read to trigger "movement" detection
     MOTION_LAUNCH_SENSITIVITY = 13   # Amount of accel added to offset for stronger initial launch accel
-    LANDED_COUNT = 10*(1/FREQUENCY)  # Number of cycles needed to be exceeded to mark as landed
-
-    acc_data = []   # 2d array
-    qua_data = []   # 2d array
-    time_data = []  # 1d array
+    LANDED_TIME = 10                 # (seconds) Motionless time needed to mark as landed
+    MIN_BOOST_TIME = 0.2             # (seconds) Minimum boost duration before burnout can be detected
+    MAX_BOOST_TIME = 5               # (seconds) Boost ends at the latest after this time
+    MAX_COAST_TIME = 20              # (seconds) Coast ends at the latest after this time (apogee)
+    TELEMETRY_RATE = 50              # (Hz) In-flight samples sent in telemetry frames
+    CHECKPOINT_INTERVAL = 0.2        # (seconds) Flight time between mission state checkpoints
+
+    profiler = StageProfiler()       # Per-stage latency histograms of the sampling loops (dump with SIGUSR1)
+    # Columnar time / acc / gyro / quaternion arrays (NaN for None), only read by the post-flight refine
+    samples = SampleStore() if refine else None
+    integrator = StreamingIntegrator()   # Navigation frame velocity / position, updated every sample
 
     # File IO setup
-    PATH_BLACKBOX = "blackbox.log"
-    if(not os.path.isfile(f"{PATH_BLACKBOX}")):
-        data_f = open(f"{PATH_BLACKBOX}", "w+")
-    data_f = open(f"{PATH_BLACKBOX}", "w+")
+    PATH_BLACKBOX = os.path.join(out_dir, "blackbox.log")
+    blackbox = AsyncBlackbox(BlackboxWriter(PATH_BLACKBOX, append=state is not None))   # Disk writes happen on a worker thread
+    checkpointer = checkpoint.Checkpointer(PATH_CHECKPOINT, state)
+
+    telemetry.event("SETUP", count=10)
 
-    transmit_rf(rfm9x, "SETUP", count=10)
+    # On-demand dump: kill -USR1 <pid> (only possible from the main thread)
+    previous_handler = None
+    if(hasattr(signal, "SIGUSR1")):
+        try:
+            previous_handler = signal.signal(signal.SIGUSR1, lambda signum, frame: dump_latency(profiler, telemetry))
+        except ValueError:
+            pass
 
 
     ### PRE-LAUNCH STANDBY ###
+    stage_time["setup"] = time.perf_counter() - time_stage
+    time_stage = time.perf_counter()
     print("Waiting for launch...")
+    phase = PHASES["standby"]
+    print(f"Phase {describe(phase)}")
+    read_imu = make_reader(imu, phase.channels)     # Only linear acceleration on the bus
+    scheduler = RateScheduler(1/phase.rate, clock, sleep)
+    acc_window = RollingWindow(round(ACC_WINDOW_TIME*phase.rate))  # Ring buffer of the latest |acc sum| values for the rolling mean
+    time_standbyStart = scheduler.start()
+    phase_log.append((phase.name, 0.0))
+    profiler.set_phase(phase.name)
     while(not hasLaunched):
-        time_thisSample = time.time()
-        if(time_thisSample - time_lastSample >= FREQUENCY):
-            time_lastSample = time_thisSample
-            acc = imu.linear_acceleration
-
-            # Guard against None values
-            if(None not in acc):
-                acc_accumulator.append(sum(acc))
+        time_thisSample = scheduler.wait()
+        t_tick = t = profiler.start()
+        acc = read_imu()[0]
+        t = profiler.mark("read", t)
+
+        # Guard against None values
+        if(None not in acc):
+            acc_window.push(abs(sum(acc)))
             
-        # Take average of latest 'ACC_WINDOW' elements of 'acc_accumulator' and check if above movement_threshold
-        if(average_window(acc_accumulator, ACC_WINDOW) > MOTION_SENSITIVITY + MOTION_LAUNCH_SENSITIVITY):
+        # Take average of the latest 'ACC_WINDOW_TIME' of values in 'acc_window' and check if above movement_threshold
+        if(acc_window.padded_mean() > MOTION_SENSITIVITY + MOTION_LAUNCH_SENSITIVITY):
             print("Launch detected!")
-            LAUNCH_COORD = acquire_gps(gps, 10)
+            LAUNCH_COORD = gps_service.coord()   # Cached fix, sampling never waits on the GPS
             hasLaunched = True
             break
+        t = profiler.mark("detect", t)
             
-        transmit_rf(rfm9x, f"Wait: t+{time_thisSample-time_launchStart} s")
+        telemetry.status(f"Wait[{phase.name}]: t+{time_thisSample-time_standbyStart} s")
+        profiler.mark("telemetry", t)
+        profiler.mark("tick", t_tick)
     
-    transmit_rf(rfm9x, "LAUNCH")
+    standby_samples = scheduler.ticks
+    if(state is None):
+        print(f"Standby timing: {scheduler.report()}")
+        time_launchDetected = time_thisSample - time_standbyStart
+        telemetry.event("LAUNCH")
+    else:
+        LAUNCH_COORD = state.launch_coord
+        time_launchDetected = state.launch_time
+        telemetry.event(f"RESUME:{BY_CODE[state.phase].name}")
     if(LAUNCH_COORD is None):
-        transmit_rf(rfm9x, "NO_LAUNCH_COORD")
+        telemetry.event("NO_LAUNCH_COORD")
 
 
     ### IN-FLIGHT DATA COLLECTION ###
+    stage_time["standby"] = time.perf_counter() - time_stage
+    time_stage = time.perf_counter()
     print("Watiting for landing...")
-    acc_accumulator.clear()
-    time_launchStart = time.time()  # Marks time at launch
-    time_lastSample = time.time()   # Reset delta timing
+    phase = PHASES["boost"] if state is None else BY_CODE[state.phase]
+    print(f"Phase {describe(phase)}")
+    telemetry.event(f"PHASE:{phase.name}")
+    read_imu = make_reader(imu, phase.channels)     # acc, gyro and quaternion in one I2C burst
+    scheduler = RateScheduler(1/phase.rate, clock, sleep)  # Fresh timing statistics for the flight
+    acc_window.clear()
+    acc_window.resize(round(ACC_WINDOW_TIME*phase.rate))
+    vertical_window = RollingWindow(round(ACC_WINDOW_TIME*phase.rate))  # Navigation frame vertical acceleration (burnout)
+    frames = FrameEncoder(decimation=max(1, round(phase.rate/TELEMETRY_RATE)))  # 15 samples per packet
+    time_launchStart = scheduler.start()  # Marks time at launch
+    time_phaseStart = 0.0
+    if(state is not None):
+        # Continue the flight timeline: clock values carry over within the same boot, else
+        # flight time continues from the last logged sample (the restart gap is lost)
+        integrator.restore(state.integrator)
+        reloaded = reload_flight(PATH_BLACKBOX, samples, integrator)
+        if(state.boot_id == checkpointer.boot_id and time_launchStart >= state.clock):
+            time_launchStart = state.launch_start
+        else:
+            time_launchStart -= max(state.time_flight, integrator.t or 0.0) + scheduler.period
+        time_phaseStart = state.phase_start
+        time_stillSince = state.still_since
+        frames.seq = state.frame_seq
+        print(f"Reloaded {reloaded} logged samples")
+        if(reloaded < state.log_records):
+            # Samples flushed before the restart are gone (log replaced or cut short): the
+            # checkpointed integrator still holds the whole flight, the sample store does not
+            print(f"Blackbox log holds {reloaded} records, the checkpoint {state.log_records}: "
+                  "using the streaming integrator result")
+            refine = False
+            samples = None
+    time_nextCheckpoint = 0.0
+    phase_log.append((phase.name, time_launchDetected + time_phaseStart))
+    profiler.set_phase(phase.name)
 
     while(not hasLanded):
-        time_thisSample = time.time()
-
-        if(time_thisSample - time_lastSample >= FREQUENCY):
-            time_lastSample = time_thisSample
-
-            acc = imu.linear_acceleration
-            omg = imu.gyro
-            qua = imu.quaternion
-
-            # Blackbox recording (ACCx,y,z QUAx,y,z)
-            data_f.write(f"{time_thisSample-time_launchStart}")
-            data_f.write(f"{acc[0]}\t{acc[1]}\t{acc[2]}\t")
-            data_f.write(f"{qua[0]}\t{qua[1]}\t{qua[2]}\t{qua[3]}\n")
-
-            # Data recording
-            time_data.append(time_thisSample-time_launchStart)
-            acc_data.append(acc)
-            qua_data.append(qua)
-
-            if(None not in acc and None not in qua):
-                acc_accumulator.append(sum(acc))
-            # Check after some duration post launch for no motion (below movement_threshold)
-            if((time_thisSample - time_launchStart >= MIN_IMU_TIME) and average_window(acc_accumulator, ACC_WINDOW) < MOTION_SENSITIVITY):
-                motionless_count += 1
-            else:
-                motionless_count = 0    # Reset on motion detection
-
-            if(motionless_count >= LANDED_COUNT):
-                print("Landing detected!")
-                print(f"Launch duration:{time_thisSample-time_launchStart}")
-                LANDED_COORD = acquire_gps(gps, 10)
-                hasLanded = True
-                break
-
-            transmit_rf(rfm9x, f"Launch: t+{time_thisSample-time_launchStart} s")
-
-    transmit_rf(rfm9x, "LANDED\n", count=10)
+        time_thisSample = scheduler.wait()
+        time_flight = time_thisSample - time_launchStart
+
+        t_tick = t = profiler.start()
+        acc, omg, qua = read_imu()
+        t = profiler.mark("read", t)
+
+        # Blackbox recording (time, ACCx,y,z GYRx,y,z QUAw,x,y,z, phase)
+        blackbox.write(time_flight, acc, omg, qua, phase.code << FLAG_PHASE_SHIFT)
+        t = profiler.mark("blackbox", t)
+
+        # Data recording (time stamped, so rate changes between phases need no special handling)
+        if(samples is not None):
+            samples.append(time_flight, acc, qua, omg)
+        integrator.update(time_flight, acc, qua)
+        vertical_window.push(integrator.acc[2])
+        t = profiler.mark("record", t)
+
+        if(None not in acc and None not in qua):
+            acc_window.push(abs(sum(acc)))
+        # Check after some duration post launch for no motion (below movement_threshold)
+        if((time_flight >= MIN_IMU_TIME) and acc_window.padded_mean() < MOTION_SENSITIVITY):
+            if(time_stillSince is None):
+                time_stillSince = time_flight
+        else:
+            time_stillSince = None    # Reset on motion detection
+
+        if(time_stillSince is not None and time_flight - time_stillSince >= LANDED_TIME):
+            print("Landing detected!")
+            print(f"Launch duration:{time_flight}")
+            print(f"Flight timing: {scheduler.report()}")
+            LANDED_COORD = gps_service.coord(max_age=GPS_MAX_AGE)
+            final_position = tuple(integrator.position)
+            phase_log.append(("landed", time_launchDetected + time_flight))
+            profiler.mark("detect", t)
+            profiler.mark("tick", t_tick)
+            hasLanded = True
+            break
+
+        # Phase changes: boost -> coast at motor burnout (vertical acceleration turns negative),
+        # coast -> descent at apogee (vertical velocity turns negative)
+        next_phase = None
+        if(phase.name == "boost"):
+            if((time_flight - time_phaseStart >= MIN_BOOST_TIME and vertical_window.mean() < 0)
+                    or time_flight - time_phaseStart >= MAX_BOOST_TIME):
+                next_phase = PHASES["coast"]
+        elif(phase.name == "coast"):
+            if(integrator.velocity[2] <= 0 or time_flight - time_phaseStart >= MAX_COAST_TIME):
+                next_phase = PHASES["descent"]
+        if(next_phase is not None):
+            telemetry.event(profiler.summary())     # Latency of the phase that just ended
+            phase = next_phase
+            profiler.set_phase(phase.name)
+            time_phaseStart = time_flight
+            print(f"Phase {describe(phase)} at t+{time_flight:.2f} s")
+            telemetry.event(f"PHASE:{phase.name}")
+            phase_log.append((phase.name, time_launchDetected + time_flight))
+            read_imu = make_reader(imu, phase.channels)
+            scheduler.set_period(1/phase.rate)
+            acc_window.resize(round(ACC_WINDOW_TIME*phase.rate))
+            vertical_window.resize(round(ACC_WINDOW_TIME*phase.rate))
+            frames.decimation = max(1, round(phase.rate/TELEMETRY_RATE))
+        t = profiler.mark("detect", t)
+
+        # Mission state checkpoint (periodic and at every phase change)
+        if(time_flight >= time_nextCheckpoint or next_phase is not None):
+            checkpointer.save(phase.code, time_thisSample, time_launchStart, time_launchDetected, time_flight,
+                              time_phaseStart, time_stillSince, LAUNCH_COORD, integrator.state(),
+                              blackbox.writer.flushed, frames.seq)
+            time_nextCheckpoint = time_flight + CHECKPOINT_INTERVAL
+        t = profiler.mark("checkpoint", t)
+
+        frame = frames.add(time_flight, acc, qua)
+        if(frame):
+            telemetry.data(frame)
+        profiler.mark("telemetry", t)
+        profiler.mark("tick", t_tick)
+
+    frame = frames.flush()
+    if(frame):
+        telemetry.data(frame)
+    telemetry.event("LANDED\n", count=10)
     if(LANDED_COORD is None):
-                transmit_rf(rfm9x, "NO_LANDING_COORD")
-    data_f.close()
+        telemetry.event("NO_LANDING_COORD")
+    dump_latency(profiler, telemetry)
+    if(previous_handler is not None):
+        signal.signal(signal.SIGUSR1, previous_handler)
+    blackbox.close()
+    gps_service.stop()
+    print(f"Blackbox: {blackbox.report()}")
 
     ### POST-FLIGHT CALCULATION ###
-    position_matrix = pos.acc_to_pos(acc_data, qua_data, time_data)
-    coeff_matrix = (position_matrix[-1][0]/THE_COEFFICIENT, position_matrix[-1][1]/THE_COEFFICIENT, position_matrix[-1][2])
+    stage_time["flight"] = time.perf_counter() - time_stage
+    time_stage = time.perf_counter()
+    if(refine):
+        final_position = tuple(pos.acc_to_pos(samples.acc, samples.qua, samples.time, engine="simpson",
+                                              zero_end_velocity=True)[-1])
+    coeff_matrix = (final_position[0]/THE_COEFFICIENT, final_position[1]/THE_COEFFICIENT, final_position[2])
 
     # Calculate grid number
     grid_num = grid.calculate_grid(LAUNCH_COORD, coeff_matrix)
     
-    if(LANDED_COORD is not None):
+    if(LAUNCH_COORD is not None and LANDED_COORD is not None):
         grid_exp = grid.dist_between_coord(LAUNCH_COORD, LANDED_COORD)
     else:
         grid_exp = "No GPS Validation"
@@ -217,19 +336,56 @@ def main():
     
     # Save data
     print("Saved data to file!")
-    with open("grid_number.txt", "w+") as file:
+    with open(os.path.join(out_dir, "grid_number.txt"), "w+") as file:
         file.write("Actual:\n")
         file.write(str_grid)
         file.write("\nExpected:\n")
         file.write(str_exp)
     
-    with open("final_position.txt", "w+") as file:
-        file.write(f"{position_matrix[-1][0]},{position_matrix[-1][1]}")
+    with open(os.path.join(out_dir, "final_position.txt"), "w+") as file:
+        file.write(f"{final_position[0]},{final_position[1]}")
+    checkpointer.clear()            # Results are on disk, a restart from here is a new mission
+    stage_time["postflight"] = time.perf_counter() - time_stage
+
+    return {
+        "launch_time": time_launchDetected,             # (s) from start of standby
+        "flight_time": time_thisSample - time_launchStart,   # (s) launch to landing detection
+        "launch_coord": LAUNCH_COORD,
+        "landed_coord": LANDED_COORD,
+        "final_position": final_position,
+        "grid_num": grid_num,
+        "str_grid": str_grid,
+        "samples": standby_samples + scheduler.ticks,
+        "flight_samples": scheduler.ticks,
+        "stage_time": stage_time,
+        "flight_timing": scheduler.report(),
+        "phases": phase_log,
+        "calibration": calibration_report,
+        "blackbox": blackbox.report(),
+        "resumed": state is not None,
+        "checkpoints": checkpointer.saves,
+        "latency": profiler.summaries(),
+    }
+
+
+# Main payload routine
+def main(dev=None):
+    # Devices default to the real hardware; pass devices.open_replay(...) to run off the Pi
+    if(dev is None):
+        dev = devices.open_hardware()
+    telemetry = Telemetry(dev.radio)    # Sends from a worker thread, sampling loops never wait on airtime
+
+    result = run_mission(dev, telemetry, resume=True)   # Continue an interrupted flight after a restart
+    str_grid = result["str_grid"]
 
     # Transmit data
     print("Send signal loop...")
+    print(f"Telemetry: {telemetry.report()}")
     while True:
-        transmit_rf(rfm9x, f"KEY:{str_grid}")
+        if(not telemetry.pending()):
+            telemetry.event(f"KEY:{str_grid}")
+        if(not telemetry.flush(KEY_FLUSH_TIMEOUT)):
+            print(f"Telemetry stalled: {telemetry.report()}")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
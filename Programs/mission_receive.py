@@ -7,6 +7,9 @@ import RPi.GPIO as GPIO
 # Import the RFM9x radio module.
 import adafruit_rfm9x
 
+# Binary telemetry frames
+import frames
+
 # Configure GPIO pins
 LED_PIN = 4
 GPIO.setmode(GPIO.BCM)
@@ -30,11 +33,33 @@ while True:
         print('RFM9x successfully set up!')
         grid_f = open("RF_grid_number.txt", "w+")
         comm_f = open("RF_blackbox.txt", "w+")
+        last_seq = None
+        lost_frames = 0
 
         while True:
             # RX
             rx_packet = rfm9x.receive()
-            if rx_packet:
+            if rx_packet and frames.is_frame(rx_packet):
+                try:
+                    frame_type, seq, base_time, payload = frames.decode_frame(rx_packet)
+                except ValueError as err:
+                    print(f"Bad frame ({err}), skipping.")
+                    continue
+
+                # Count frames lost in between (sequence numbers wrap at 16 bits)
+                if last_seq is not None:
+                    lost_frames += (seq - last_seq - 1) & 0xFFFF
+                last_seq = seq
+
+                if frame_type == frames.TYPE_SAMPLES:
+                    # One line per sample: time, ACCx,y,z QUAw,x,y,z
+                    for t, acc, qua in payload:
+                        comm_f.write(f"{t:.3f}\t" + "\t".join(map(str, acc + qua)) + "\n")
+                    print(f'Frame {seq}: {len(payload)} samples @ t+{base_time:.2f} s (lost: {lost_frames})\n')
+                else:
+                    comm_f.write(payload + "\n")
+                    print(f'Read: {payload}\n')
+            elif rx_packet:
                 try:
                     rx_data = str(rx_packet, "utf-8")
                     if rx_data != None:
@@ -11,15 +11,11 @@
 import numpy as np
 from numpy.linalg import inv, norm
 from mathlib import *
+import dtypes
+import ekf
 
 import time
 import math
-import board
-import adafruit_bno055
-
-
-i2c = board.I2C()
-sensor = adafruit_bno055.BNO055_I2C(i2c)
 
 
 
@@ -88,7 +84,7 @@ class IMUTracker:
      #   mag_noise = noise_coefficient['m'] * np.linalg.norm(mvar)
         return (gn, g0, gyro_noise, gyro_bias, acc_noise)
 
-    def attitudeTrack(self, data, init_list):
+    def attitudeTrack(self, data, init_list, update=True):
         '''
         Removes gravity from acceleration data and transform it into navitgaion frame.
         Also tracks device's orientation.
@@ -96,6 +92,8 @@ class IMUTracker:
         @param data: (,9) ndarray
         @param list: initialization values for EKF algorithm: 
         (gn, g0, mn, gyro_noise, gyro_bias, acc_noise, mag_noise)
+        @param update: correct the orientation with the measured gravity direction
+                       (False: gyro propagation only)
 
         Return: (acc, orientation)
         '''
@@ -107,107 +105,13 @@ class IMUTracker:
         w = data[:, self._widx[0]:self._widx[1]] - gyro_bias
         a = data[:, self._aidx[0]:self._aidx[1]]
      #   m = data[:, self._midx[0]:self._midx[1]]
-        sample_number = np.shape(data)[0]
-
-        # ---- data container ----
-        a_nav = []
-        orix = []
-        oriy = []
-        oriz = []
-
-        # ---- states and covariance matrix ----
-        P = 1e-10 * I(4)    # state covariance matrix
-        q = np.array([[1, 0, 0, 0]]).T    # quaternion state
-        init_ori = I(3)   # initial orientation
 
         # ------------------------------- #
         # ---- Extended Kalman Filter ----
         # ------------------------------- #
 
-        # all vectors are column vectors
-
-        t = 0
-        while t < sample_number:
-
-            # ------------------------------- #
-            # ---- 0. Data Preparation ----
-            # ------------------------------- #
-
-            wt = w[t, np.newaxis].T
-            at = a[t, np.newaxis].T
-         #   mt = normalized(m[t, np.newaxis].T)
-
-            # ------------------------------- #
-            # ---- 1. Propagation ----
-            # ------------------------------- #
-
-            Ft = F(q, wt, self.dt)
-            Gt = G(q)
-            Q = (gyro_noise * self.dt)**2 * Gt @ Gt.T
-
-            q = normalized(Ft @ q)
-            P = Ft @ P @ Ft.T + Q
-
-            # ------------------------------- #
-            # ---- 2. Measurement Update ----
-            # ------------------------------- #
-
-            # Use normalized measurements to reduce error!
-
-            # ---- acc and mag prediction ----
-            pa = normalized(-rotate(q) @ gn)
-         #   pm = normalized(rotate(q) @ mn)
-
-            # ---- residual ----
-       #     Eps = np.vstack((normalized(at), mt)) - np.vstack((pa, pm))
-
-            # ---- sensor noise ----
-            # R = internal error + external error
-            Ra = [(acc_noise / np.linalg.norm(at))**2 + (1 - g0 / np.linalg.norm(at))**2] * 3
-        #    Rm = [mag_noise**2] * 3
-         #   R = np.diag(Ra + Rm)
-
-            # ---- kalman gain ----
-       #     Ht = H(q, gn, mn)
-         #   S = Ht @ P @ Ht.T + R
-         #   K = P @ Ht.T @ np.linalg.inv(S)
-
-            # ---- actual update ----
-         #   q = q + K @ Eps
-         #   P = P - K @ Ht @ P
-
-            # ------------------------------- #
-            # ---- 3. Post Correction ----
-            # ------------------------------- #
-
-            q = normalized(q)
-            P = 0.5 * (P + P.T)    # make sure P is symmertical
-
-            # ------------------------------- #
-            # ---- 4. other things ----
-            # ------------------------------- #
-
-            # ---- navigation frame acceleration ----
-            conj = -I(4)
-            conj[0, 0] = 1
-            an = rotate(conj @ q) @ at + gn
-
-            # ---- navigation frame orientation ----
-            orin = rotate(conj @ q) @ init_ori
-
-            # ---- saving data ----
-            a_nav.append(an.T[0])
-            orix.append(orin.T[0, :])
-            oriy.append(orin.T[1, :])
-            oriz.append(orin.T[2, :])
-
-            t += 1
-
-        a_nav = np.array(a_nav)
-        orix = np.array(orix)
-        oriy = np.array(oriy)
-        oriz = np.array(oriz)
-        return (a_nav, orix, oriy, oriz)
+        # quaternion state and covariance, propagation and gravity update: ekf.py
+        return ekf.attitude_track(w, a, self.dt, gn, g0, gyro_noise, acc_noise, update)
 
     def removeAccErr(self, a_nav, threshold=0.2, filter=False, wn=(0.01, 15)):
         '''
@@ -326,5 +230,5 @@ def receive_data():
     file = open('data.txt', 'r')
     for line in file.readlines():
         data.append(line.split(','))
-    data = np.array(data, dtype=np.float64)
+    data = dtypes.as_float(data)      # compute dtype of the dtype policy (dtypes.py)
     return data
\ No newline at end of file
@@ -0,0 +1,42 @@
+# Per flight phase sampling policy
+#
+# Each phase lists the sensor channels it reads and its sample rate.  Standby only needs
+# linear acceleration for launch detection, so it reads the 6 byte LIA_DATA block instead
+# of the 26 byte burst, which leaves the shared I2C bus to the GPS.  Boost and coast are
+# short and highly dynamic, so they sample fast; descent under parachute lasts over a
+# minute and changes slowly, so it samples at a fraction of the rate (smaller logs, less
+# CPU).
+#
+# Every channel is a fusion output (IMUPLUS mode), which the BNO055 updates at 100 Hz
+# (FUSION_RATE).  Reading faster only returns each value again, so no phase goes above it.
+#
+#   code:     phase number, stored in the blackbox record flags
+#   channels: "acc" linear acceleration, "gyr" gyroscope, "qua" quaternion
+#   rate:     samples per second
+
+import collections
+
+Phase = collections.namedtuple("Phase", ["name", "code", "channels", "rate"])
+
+ALL_CHANNELS = ("acc", "gyr", "qua")
+FUSION_RATE = 100           # (Hz) BNO055 fusion output data rate (linear acceleration, quaternion)
+
+PHASES = {
+    "standby": Phase("standby", 0, ("acc",),      FUSION_RATE),
+    "boost":   Phase("boost",   1, ALL_CHANNELS,  FUSION_RATE),
+    "coast":   Phase("coast",   2, ALL_CHANNELS,  FUSION_RATE),
+    "descent": Phase("descent", 3, ALL_CHANNELS,  20),
+    "landed":  Phase("landed",  4, (),            0),
+}
+
+BY_CODE = {phase.code: phase for phase in PHASES.values()}
+
+
+def describe(phase):
+    channels = ",".join(phase.channels) if phase.channels else "-"
+    rate = f"{phase.rate} Hz" if phase.rate else "off"
+    return f"{phase.name}: {channels} @ {rate}"
+
+
+def format_policy(phases=PHASES):
+    return "\n".join("  " + describe(phase) for phase in phases.values())
@@ -1,33 +1,44 @@
 import time
 import average as avg
-import numpy as np
-import board
-import adafruit_bno055
-import scipy.integrate as it
-from scipy.spatial.transform import Rotation as R
+import smoothing
+import integration
+import blackbox
+import dtypes
+
+# NumPy and SciPy are imported inside the functions that need them, so importing this
+# module (e.g. from mission_main at boot) costs nothing until post-flight computation
 
 NOISE = 0.5
 SAMPLE_RATE = 100
+SMOOTHING = "neighbor"      # Acceleration filter, see smoothing.py
+INTEGRATION = "trapezoid"   # Integration engine, see integration.py
+CHUNK_RECORDS = 65536       # Records per block in log_to_pos
+CHUNK_MARGIN = 256          # Records of context read on each side of a block (smoothing window)
+CARRY = 4                   # Samples of the previous block prepended when integrating a block
 
-i2c = board.I2C()
-bno = adafruit_bno055.BNO055_I2C(i2c)
-bno.mode = adafruit_bno055.IMUPLUS_MODE
-bno.accel_range = adafruit_bno055.ACCEL_16G
-
-def acc_to_pos(data_acc, data_qua, data_time):
-    samples = len(data_time)
+# data_acc (N,3), data_qua (N,4) and data_time (N) may be lists (None for missing values)
+# or NumPy arrays (NaN for missing values, e.g. SampleStore views, used without copying)
+# 'smooth' names the acceleration filter (smoothing.FILTERS), 'smooth_options' its parameters
+# 'engine' names the integration scheme (integration.ENGINES); 'zero_end_velocity' removes
+# the drift that leaves a velocity at the last sample (the payload has landed)
+def acc_to_pos(data_acc, data_qua, data_time, smooth=SMOOTHING, smooth_options=None,
+               engine=INTEGRATION, zero_end_velocity=False):
+    # Fill missing samples: interpolate acceleration (in time, the rate changes between
+    # phases), hold the last quaternion
+    data_acc, acc_filled = avg.fill_gaps(data_acc, "interp", t=data_time)
+    data_qua, qua_filled = avg.fill_gaps(data_qua, "hold")
+    print(f"Filled {acc_filled.sum()} acceleration and {qua_filled.sum()} quaternion gaps")
+    data_acc = smoothing.smooth(data_acc, smooth, t=data_time, **(smooth_options or {}))
 
-    data_acc = np.array(avg.average_acc(avg.data_none(np.array(data_acc))))
-    data_qua = np.array(avg.data_none(np.array(data_qua)))
-    data_rot = np.array(list(map(lambda q: R.from_quat((*(q[1:]), q[0])).as_matrix(), data_qua)))
-    abs_acc = []
-    for i in range(samples):
-        abs_acc.append(np.dot(data_rot[i],data_acc[i]))
+    # Rotate every sample into the navigation frame in one batched call
+    nav_acc = to_nav_frame(data_qua, data_acc)
 
-    # Calculate vel and disp (cumulative trapezoidal integration)            
+    # Calculate vel and disp (cumulative integration, see integration.py)
     print("Calculating position...")
-    calc_vel = map(lambda acc_arr: it.cumtrapz(acc_arr, data_time, initial=0), data_acc.T)
-    calc_pos = np.array(list(map(lambda vel_arr: it.cumtrapz(vel_arr, data_time, initial=0), calc_vel))).T
+    result = integration.integrate_twice(nav_acc, data_time, engine, zero_end_velocity)
+    calc_pos = result.position
+    print(f"Integration ({engine}): estimated error velocity {result.velocity_error} m/s, "
+          f"position {result.position_error} m, removed bias {result.bias} m/s^2")
 
     print("Calculated positions")
     print(calc_pos)
@@ -35,6 +46,134 @@ def acc_to_pos(data_acc, data_qua, data_time):
     return calc_pos
 
 
+# Out-of-core version of acc_to_pos for a blackbox log: the log is memory-mapped and
+# processed in blocks of 'chunk' records, so memory stays bounded for any flight length.
+#   - gaps at a block boundary are filled from the nearest valid record outside the block
+#     (interpolation / hold as in acc_to_pos)
+#   - each block is smoothed with 'margin' records of context on both sides (must cover
+#     the smoothing window; for "butterworth" several time constants of the filter)
+#   - velocity and position are carried from block to block (see _continue; exact for
+#     "trapezoid" and "simpson", approximate at block boundaries for "romberg")
+# 'on_chunk(t, position)' is called with every block's (uncorrected) position track
+# Return: final position (3)
+def log_to_pos(path, chunk=CHUNK_RECORDS, margin=CHUNK_MARGIN, smooth=SMOOTHING, smooth_options=None,
+               engine=INTEGRATION, zero_end_velocity=False, on_chunk=None):
+    import numpy as np
+    records = blackbox.map_blackbox(path)
+    n = len(records)
+    if(n == 0):
+        raise ValueError("empty blackbox log")
+
+    if(chunk < CARRY or chunk % 2):
+        raise ValueError(f"chunk must be even and at least {CARRY}")
+    carry_t = carry_acc = carry_vel = carry_pos = None
+    for start in range(0, n, chunk):
+        stop = min(n, start + chunk)
+        lo, hi = max(0, start - margin), min(n, stop + margin)
+        block = records[lo:hi]
+        t = np.array(block["time"], dtype=np.float64)
+        acc = _fill_block(records, "acc", lo, hi, t, dtypes.as_float(block["acc"]), "interp")
+        qua = _fill_block(records, "qua", lo, hi, t, dtypes.as_float(block["qua"]), "hold")
+        acc = smoothing.smooth(acc, smooth, t=t, **(smooth_options or {}))
+
+        c0, c1 = start - lo, stop - lo
+        t = t[c0:c1]
+        nav_acc = to_nav_frame(qua[c0:c1], acc[c0:c1])
+        vel = _continue(nav_acc, t, carry_acc, carry_t, carry_vel, engine)
+        pos = _continue(vel, t, carry_vel, carry_t, carry_pos, engine)
+        carry_t, carry_acc, carry_vel, carry_pos = t[-CARRY:], nav_acc[-CARRY:], vel[-CARRY:], pos[-CARRY:]
+        if(on_chunk):
+            on_chunk(t, pos)
+
+    # A constant acceleration bias b adds b*(t-t0) to the velocity and b*(t-t0)^2/2 to
+    # the position (integrated exactly by every engine), so it is removed at the end
+    velocity, position = carry_vel[-1], carry_pos[-1]
+    duration = float(records["time"][-1] - records["time"][0])
+    bias = np.zeros(3)
+    if(zero_end_velocity and duration > 0):
+        bias = velocity/duration
+        position = position - bias*duration**2/2
+    print(f"Reconstructed {n} records in {-(-n//chunk)} blocks ({engine}), removed bias {bias} m/s^2")
+    return position
+
+
+# Fill missing vectors of records[lo:hi][field] ('values'), using the nearest valid record
+# outside the block as an anchor where the block starts or ends with a gap
+def _fill_block(records, field, lo, hi, t, values, method):
+    import numpy as np
+    missing = np.isnan(values).any(axis=1)
+    if(not missing.any()):
+        return values
+    before = _find_valid(records, field, lo - 1, -1) if missing[0] else None
+    after = _find_valid(records, field, hi, 1) if missing[-1] and method == "interp" else None
+    anchors_t, anchors = [t], [values]
+    if(before is not None):
+        anchors_t.insert(0, [records["time"][before]])
+        anchors.insert(0, dtypes.as_float(records[field][before:before + 1], values.dtype))
+    if(after is not None):
+        anchors_t.append([records["time"][after]])
+        anchors.append(dtypes.as_float(records[field][after:after + 1], values.dtype))
+    filled, _ = avg.fill_gaps(np.concatenate(anchors), method, t=np.concatenate(anchors_t))
+    first = 1 if before is not None else 0
+    return filled[first:first + len(values)]
+
+
+# Index of the nearest record from 'index' in direction 'step' (1 or -1) whose 'field' has
+# no missing value, None if there is none; searches the memory map in blocks
+def _find_valid(records, field, index, step, block=4096):
+    import numpy as np
+    n = len(records)
+    while(0 <= index < n):
+        lo, hi = (index, min(n, index + block)) if step > 0 else (max(0, index - block + 1), index + 1)
+        ok = np.flatnonzero(~np.isnan(records[field][lo:hi]).any(axis=1))
+        if(len(ok)):
+            return lo + (ok[0] if step > 0 else ok[-1])
+        index = hi if step > 0 else lo - 1
+    return None
+
+
+# Running integral of 'values' over 't' continuing the previous block: its last CARRY
+# samples (carry_values at carry_t, with running integral carry_integral) are prepended and
+# the result is taken relative to the second to last of them.  Trapezoid and Simpson (left
+# neighbour stencil) then match the whole-log result to rounding.  Romberg is approximate
+# across block boundaries: its correction is interpolated between even samples within a
+# block but extrapolated at the block edges, so the chunked result differs slightly from
+# the whole-log one (~1e-5 m for 1024-record blocks)
+def _continue(values, t, carry_values, carry_t, carry_integral, engine):
+    import numpy as np
+    if(carry_t is None):
+        return integration.cumulative(values, t, engine)
+    k = len(carry_t)
+    running = integration.cumulative(np.concatenate((carry_values, values)), np.concatenate((carry_t, t)), engine)
+    return running[k:] - running[k - 2] + carry_integral[k - 2]
+
+
+# Rotate body frame vectors (N,3) into the navigation frame with quaternions (N,4, w,x,y,z)
+# Same as integrator.rotate_to_nav for every sample, as one Rotation over the whole array.
+# SciPy rotations are float64 only, so with a float32 compute dtype (dtypes.py) the same
+# rotation is written out as whole-array float32 operations instead
+def to_nav_frame(data_qua, data_acc):
+    import numpy as np
+    from scipy.spatial.transform import Rotation as R
+    dtype = np.dtype(dtypes.policy().compute)
+    if(dtype != np.float64):
+        return _rotate(dtypes.as_float(data_qua, dtype), dtypes.as_float(data_acc, dtype))
+    try:
+        rot = R.from_quat(data_qua, scalar_first=True)     # SciPy >= 1.14 reads w,x,y,z directly
+    except TypeError:
+        rot = R.from_quat(np.asarray(data_qua)[:, [1, 2, 3, 0]])   # scalar last (x,y,z,w)
+    return rot.apply(data_acc)
+
+
+def _rotate(qua, vec):
+    # v' = v + 2 w (u x v) + 2 u x (u x v) for unit q = (w, u), in the dtype of the inputs
+    import numpy as np
+    qua = qua/np.linalg.norm(qua, axis=1, keepdims=True)
+    w, u = qua[:, :1], qua[:, 1:]
+    uv = np.cross(u, vec)
+    return vec + 2*(w*uv + np.cross(u, uv))
+
+
 def filter_noise(values, noise):
     filtered = []
     for value in values:
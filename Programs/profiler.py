@@ -0,0 +1,127 @@
+# Hot-path latency instrumentation
+#
+# Each stage of the sampling loop (sensor read, blackbox write, recording, detection,
+# checkpoint, telemetry) is timed with the monotonic perf counter and counted in a
+# fixed-bucket histogram, so the cost per sample is a perf_counter() call, a bisect and
+# an increment with no allocation.  Histograms are kept per flight phase.
+#
+#   t = prof.start()
+#   acc, gyr, qua = read_imu()
+#   t = prof.mark("read", t)        # records the time since 't', returns now
+#
+# summary() is one line short enough for a telemetry packet (frames.MAX_PAYLOAD):
+#   LAT[boost] n:1200 tick:0.21/0.52/1.84 read:0.05/0.10/0.31 ...   (ms p50/p99/max)
+# format_table() is the full per-bucket dump.
+
+import bisect
+import math
+import time
+
+MAX_SUMMARY = 252           # RFM9x max payload (bytes)
+
+# Bucket upper bounds (seconds); the last bucket counts everything above BUCKETS[-1]
+BUCKETS = (10e-6, 20e-6, 50e-6, 100e-6, 200e-6, 500e-6,
+           1e-3, 2e-3, 5e-3, 10e-3, 20e-3, 50e-3, 100e-3)
+
+STAGE_NAMES = {"tick": "tick", "read": "read", "blackbox": "bb", "record": "rec",
+               "detect": "det", "checkpoint": "chk", "telemetry": "tx"}
+
+
+class Histogram:
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0]*(len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if(value > self.max):
+            self.max = value
+
+    def mean(self):
+        return self.total/self.count if self.count else 0.0
+
+    def percentile(self, p):
+        # Upper bound of the bucket holding the p-th percentile (never above the max seen)
+        if(self.count == 0):
+            return 0.0
+        rank = max(1, math.ceil(p/100*self.count))
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            cumulative += n
+            if(cumulative >= rank):
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+
+class StageProfiler:
+
+    def __init__(self, stages=tuple(STAGE_NAMES), clock=time.perf_counter, bounds=BUCKETS):
+        '''
+        @param stages: stage names, in summary order
+        @param clock: monotonic time source (wall clock, also under a virtual replay clock)
+        @param bounds: histogram bucket upper bounds in seconds
+        '''
+        self.stages = stages
+        self.clock = clock
+        self.bounds = bounds
+        self.phases = {}            # phase name -> {stage: Histogram}
+        self.phase = None
+        self._hist = None
+        self.set_phase("-")
+
+    def set_phase(self, phase):
+        # Following marks go to the histograms of 'phase' (created on first use)
+        if(phase not in self.phases):
+            self.phases[phase] = {stage: Histogram(self.bounds) for stage in self.stages}
+        self.phase = phase
+        self._hist = self.phases[phase]
+
+    def start(self):
+        return self.clock()
+
+    def mark(self, stage, since):
+        now = self.clock()
+        self._hist[stage].add(now - since)
+        return now
+
+    def summary(self, phase=None):
+        # One line (at most MAX_SUMMARY bytes): p50/p99/max in ms per stage
+        phase = self.phase if phase is None else phase
+        hist = self.phases.get(phase, {})
+        count = max((h.count for h in hist.values()), default=0)
+        parts = [f"LAT[{phase}] n:{count}"]
+        for stage in self.stages:
+            h = hist.get(stage)
+            if(h is None or h.count == 0):
+                continue
+            parts.append(f"{STAGE_NAMES.get(stage, stage)}:{h.percentile(50)*1000:.2f}"
+                         f"/{h.percentile(99)*1000:.2f}/{h.max*1000:.2f}")
+        return " ".join(parts)[:MAX_SUMMARY]
+
+    def summaries(self):
+        # summary() of every phase with samples, in the order they were entered
+        return [self.summary(phase) for phase, hist in self.phases.items()
+                if any(h.count for h in hist.values())]
+
+    def format_table(self):
+        # Full dump: per phase and stage, count, mean, p50/p90/p99/max and bucket counts
+        buckets = "".join(f"{b*1e6:>7.0f}" for b in self.bounds) + f"{'>':>7}"
+        lines = [f"{'phase':<8} {'stage':<10}{'n':>7}{'mean':>8}{'p50':>8}{'p90':>8}{'p99':>8}{'max':>8}  (ms)  <=us{buckets}"]
+        for phase, hist in self.phases.items():
+            for stage in self.stages:
+                h = hist[stage]
+                if(h.count == 0):
+                    continue
+                ms = [v*1000 for v in (h.mean(), h.percentile(50), h.percentile(90), h.percentile(99), h.max)]
+                counts = "".join(f"{n:>7}" for n in h.counts)
+                lines.append(f"{phase:<8} {stage:<10}{h.count:>7}" + "".join(f"{v:>8.3f}" for v in ms)
+                             + f"{'':10}{counts}")
+        return "\n".join(lines)
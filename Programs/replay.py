@@ -0,0 +1,132 @@
+# Faster-than-real-time mission replay
+#
+# Runs mission_main.run_mission() (standby, launch detection, in-flight logging, landing
+# detection, post-flight grid calculation) against recorded flights on simulated devices.
+# The sample scheduler and replayed IMU share a virtual clock whose sleep() just moves
+# time forward, so a flight replays as fast as the CPU can process it.
+#
+# Usage: python replay.py [--quiet] [--registers] [--coord LAT,LON] <recording> [<recording> ...]
+#   recordings: blackbox logs, IMU_Test/data.txt style CSV or Xsens style txt
+#   --registers: read the IMU through the simulated BNO055 registers (burst read path)
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import devices
+import mission_main
+from telemetry import Telemetry
+
+
+USAGE = "usage: python replay.py [--quiet] [--registers] [--coord LAT,LON] <recording> [<recording> ...]"
+
+
+class ReplayTimeout(Exception):
+    pass
+
+
+class VirtualClock:
+
+    def __init__(self, limit=None):
+        '''
+        @param limit: virtual seconds after which sleep() raises ReplayTimeout
+                      (stops a replay whose launch or landing is never detected)
+        '''
+        self.now = 0.0
+        self.limit = limit
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        if(seconds > 0):
+            self.now += seconds
+        if(self.limit is not None and self.now > self.limit):
+            raise ReplayTimeout(f"nothing detected after {self.now:.1f} virtual seconds")
+
+
+def run_replay(recording, launch_coord=None, pad_before=2.0, pad_after=15.0, quiet=True, out_dir=None,
+               register_level=False):
+    '''
+    Replay one recording through the full mission.
+
+    @param recording: path or list of (t, acc, gyr, qua) records
+    @param launch_coord: (lat, lon) reported by the simulated GPS, None for no fix
+    @param pad_before / pad_after: seconds of motionless data around the recording
+    @param register_level: read the IMU through the simulated BNO055 registers
+    Return: run_mission() summary plus 'wall_time', 'samples_per_s', 'error'
+    '''
+    records = devices.load_recording(recording) if isinstance(recording, str) else recording
+    clock = VirtualClock()
+    dev = devices.open_replay(records, clock=clock, sleep=clock.sleep, launch_coord=launch_coord,
+                              pad_before=pad_before, pad_after=pad_after, register_level=register_level)
+    clock.limit = dev.imu.duration() + 5.0
+    telemetry = Telemetry(dev.radio, rate=1e9, status_decimation=1)   # No radio pacing in replay
+
+    out = io.StringIO()
+    with contextlib.ExitStack() as stack:
+        if(out_dir is None):
+            out_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        if(quiet):
+            stack.enter_context(contextlib.redirect_stdout(out))
+
+        start = time.perf_counter()
+        try:
+            result = mission_main.run_mission(dev, telemetry, clock=clock, sleep=clock.sleep, out_dir=out_dir,
+                                              gps_timeout=0.5)
+            result["error"] = None
+        except ReplayTimeout as err:
+            result = {"error": str(err), "samples": dev.imu.reads, "grid_num": None,
+                      "launch_time": None, "flight_time": None, "stage_time": {}}
+        result["wall_time"] = time.perf_counter() - start
+        telemetry.close()
+
+    result["virtual_time"] = clock.now
+    result["samples_per_s"] = result["samples"]/result["wall_time"] if result["wall_time"] else 0.0
+    result["packets"] = dev.radio.sent
+    return result
+
+
+def format_result(name, result):
+    lines = [f"== {name}"]
+    if(result["error"]):
+        lines.append(f"  ERROR: {result['error']}")
+    else:
+        lines.append(f"  launch detected:  t+{result['launch_time']:.2f} s (standby)")
+        lines.append(f"  landing detected: {result['flight_time']:.2f} s after launch")
+        lines.append(f"  grid number:      {result['grid_num']}")
+    lines.append(f"  samples:          {result['samples']} in {result['wall_time']:.3f} s wall "
+                 f"({result['samples_per_s']:.0f} samples/s, {result['virtual_time']/max(result['wall_time'], 1e-9):.0f}x real time)")
+    for stage, seconds in result["stage_time"].items():
+        lines.append(f"  {stage:<17} {seconds*1000:.1f} ms")
+    for line in result.get("latency", ()):
+        lines.append(f"  {line}")
+    return "\n".join(lines)
+
+
+def main(argv):
+    quiet = "--quiet" in argv
+    register_level = "--registers" in argv
+    argv = [a for a in argv if a not in ("--quiet", "--registers")]
+    launch_coord = None
+    if("--coord" in argv):
+        i = argv.index("--coord")
+        launch_coord = tuple(float(v) for v in argv[i+1].split(","))
+        del argv[i:i+2]
+    if(not argv):
+        print(USAGE)
+        return 1
+
+    failed = 0
+    for path in argv:
+        result = run_replay(path, launch_coord=launch_coord, quiet=quiet, register_level=register_level)
+        print(format_result(os.path.basename(path), result))
+        failed += result["error"] is not None
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,98 @@
+# Fixed-capacity ring buffer with an incrementally maintained running sum
+#
+# Used for the rolling means in launch/landing detection: push() and mean() are O(1)
+# and memory stays at 'capacity' values no matter how long the payload sits on the pad.
+# The running sums are recomputed every RESYNC_WRAPS passes over the buffer so float
+# error cannot build up during a long pad wait (amortized cost stays O(1)).
+
+RESYNC_WRAPS = 64
+
+class RollingWindow:
+
+    def __init__(self, capacity):
+        '''
+        @param capacity: number of most recent values kept in the window
+        '''
+        if(capacity <= 0):
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._values = [0.0]*capacity
+        self._idx = 0
+        self._count = 0
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._wraps = 0
+
+    def __len__(self):
+        return self._count
+
+    def push(self, value):
+        old = self._values[self._idx]
+        self._values[self._idx] = value
+        self._idx = (self._idx + 1) % self.capacity
+        if(self._count < self.capacity):
+            self._count += 1
+            self._sum += value
+            self._sumsq += value*value
+        else:
+            self._sum += value - old
+            self._sumsq += value*value - old*old
+        if(self._idx == 0):
+            self._wraps += 1
+            if(self._wraps >= RESYNC_WRAPS):
+                self._wraps = 0
+                self.resync()
+
+    def clear(self):
+        self._values = [0.0]*self.capacity
+        self._idx = 0
+        self._count = 0
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._wraps = 0
+
+    def resize(self, capacity):
+        # Change the capacity, keeping the most recent values that still fit
+        if(capacity <= 0):
+            raise ValueError("capacity must be positive")
+        if(self._count < self.capacity):
+            live = self._values[:self._idx]
+        else:
+            live = self._values[self._idx:] + self._values[:self._idx]
+        live = live[max(0, len(live) - capacity):]
+        self.capacity = capacity
+        self.clear()
+        for value in live:
+            self.push(value)
+
+    def full(self):
+        return self._count == self.capacity
+
+    def sum(self):
+        return self._sum
+
+    def mean(self):
+        # Mean over the values currently held
+        if(self._count == 0):
+            return 0
+        return self._sum/self._count
+
+    def padded_mean(self):
+        # Mean over the whole capacity, empty slots counting as 0
+        # (same as the old average_window(list, window) when fewer than 'window' values exist)
+        return self._sum/self.capacity
+
+    def variance(self):
+        if(self._count == 0):
+            return 0
+        mean = self._sum/self._count
+        return max(0.0, self._sumsq/self._count - mean*mean)
+
+    def resync(self):
+        # Recompute the running sums from the stored values to shed accumulated float error
+        if(self._count < self.capacity):
+            live = self._values[:self._idx]
+        else:
+            live = self._values
+        self._sum = sum(live)
+        self._sumsq = sum(v*v for v in live)
@@ -0,0 +1,104 @@
+# Columnar in-flight sample store
+#
+# Samples go straight into preallocated NumPy columns (time, acc xyz, gyro xyz, quaternion
+# wxyz) instead of Python lists of tuples.  Capacity doubles when full, so appends are
+# amortized O(1) and memory is ~8 bytes per value instead of a Python float + tuple each.
+# Missing (None) values are stored as NaN; the valid_* masks tell them apart.
+#
+# The time/acc/gyr/qua properties are zero-copy views of the filled part.  A view stays
+# valid until the next append that grows the store, so take them after collection ends.
+#
+# NumPy is imported when the first store is created (mission setup), not at import time.
+# The sensor columns use the storage dtype of the dtype policy (dtypes.py) by default.
+
+import dtypes
+
+NAN = float("nan")
+NAN3 = (NAN, NAN, NAN)
+NAN4 = (NAN, NAN, NAN, NAN)
+
+
+def _clean(values, missing):
+    # None for the whole vector or for single axes becomes NaN
+    if(values is None):
+        return missing
+    if(None in values):
+        return tuple(NAN if v is None else v for v in values)
+    return values
+
+
+class SampleStore:
+
+    def __init__(self, capacity=4096, dtype=None):
+        '''
+        @param capacity: initial number of samples (grows by doubling)
+        @param dtype: storage dtype for the sensor columns (time is always float64),
+                      by default the policy's storage dtype
+        '''
+        import numpy as np
+        self._np = np
+        self.dtype = np.dtype(dtype or dtypes.policy().storage)
+        self.n = 0
+        self._alloc(max(1, capacity))
+
+    def _alloc(self, capacity):
+        np = self._np
+        self._time = np.empty(capacity, dtype=np.float64)
+        self._acc = np.empty((capacity, 3), dtype=self.dtype)
+        self._gyr = np.empty((capacity, 3), dtype=self.dtype)
+        self._qua = np.empty((capacity, 4), dtype=self.dtype)
+
+    def capacity(self):
+        return len(self._time)
+
+    def _grow(self):
+        old = (self._time, self._acc, self._gyr, self._qua)
+        self._alloc(2*len(self._time))
+        for new, prev in zip((self._time, self._acc, self._gyr, self._qua), old):
+            new[:self.n] = prev[:self.n]
+
+    def __len__(self):
+        return self.n
+
+    def append(self, t, acc, qua, gyr=None):
+        if(self.n == len(self._time)):
+            self._grow()
+        i = self.n
+        self._time[i] = t
+        self._acc[i] = _clean(acc, NAN3)
+        self._qua[i] = _clean(qua, NAN4)
+        self._gyr[i] = _clean(gyr, NAN3)
+        self.n += 1
+
+    def trim(self):
+        # Release unused capacity (copies once)
+        if(self.n < len(self._time)):
+            self._time = self._time[:self.n].copy()
+            self._acc = self._acc[:self.n].copy()
+            self._gyr = self._gyr[:self.n].copy()
+            self._qua = self._qua[:self.n].copy()
+
+    @property
+    def time(self):
+        return self._time[:self.n]
+
+    @property
+    def acc(self):
+        return self._acc[:self.n]
+
+    @property
+    def gyr(self):
+        return self._gyr[:self.n]
+
+    @property
+    def qua(self):
+        return self._qua[:self.n]
+
+    def valid_acc(self):
+        return ~self._np.isnan(self.acc).any(axis=1)
+
+    def valid_qua(self):
+        return ~self._np.isnan(self.qua).any(axis=1)
+
+    def nbytes(self):
+        return self._time.nbytes + self._acc.nbytes + self._gyr.nbytes + self._qua.nbytes
@@ -0,0 +1,103 @@
+# Fixed-rate sampling scheduler
+#
+# Fires on absolute deadlines (start + n*period) from the monotonic clock, so a late
+# sample does not push every later sample back.  Between ticks the loop sleeps instead
+# of spinning on time.time().  Timing quality is tracked as missed deadlines and the
+# jitter (actual - deadline) of every tick.
+
+import time
+
+
+class RateScheduler:
+
+    def __init__(self, period, clock=time.monotonic, sleep=time.sleep, max_jitter_samples=4096):
+        '''
+        @param period: time between samples, in seconds (e.g. 1/100)
+        @param clock: monotonic time source
+        @param sleep: sleep function matching the clock (swap both for a virtual clock)
+        @param max_jitter_samples: number of most recent jitter values kept for percentiles
+        '''
+        self.period = period
+        self.clock = clock
+        self.sleep = sleep
+
+        self.ticks = 0              # Number of samples fired
+        self.missed = 0             # Number of deadlines skipped because we were already past them
+        self.late = 0               # Number of ticks fired after their deadline by more than one period
+
+        self._start = None
+        self._next = None
+        self._jitter = [0.0]*max_jitter_samples
+        self._jitter_idx = 0
+        self._jitter_len = 0
+
+    def start(self):
+        self._start = self.clock()
+        self._next = self._start
+        return self._start
+
+    def wait(self):
+        '''
+        Sleep until the next deadline and return the sample time.
+        If one or more deadlines were already missed they are skipped (counted in 'missed')
+        and the schedule stays anchored to the original start time.
+        '''
+        if(self._next is None):
+            self.start()
+
+        now = self.clock()
+        remaining = self._next - now
+        if(remaining > 0):
+            self.sleep(remaining)
+            now = self.clock()
+
+        deadline = self._next
+        jitter = now - deadline
+        if(jitter >= self.period):
+            self.late += 1
+            skipped = int(jitter // self.period)
+            self.missed += skipped
+            self._next = deadline + (skipped + 1)*self.period
+        else:
+            self._next = deadline + self.period
+
+        self._record(jitter)
+        self.ticks += 1
+        return now
+
+    def set_period(self, period):
+        # Change the sample rate; the next deadline is one new period after the last one
+        if(self._next is not None):
+            self._next += period - self.period
+        self.period = period
+
+    def reset(self):
+        # Re-anchor the schedule (e.g. at a phase change), keeps counters
+        self._next = None
+
+    def _record(self, jitter):
+        self._jitter[self._jitter_idx] = jitter
+        self._jitter_idx = (self._jitter_idx + 1) % len(self._jitter)
+        if(self._jitter_len < len(self._jitter)):
+            self._jitter_len += 1
+
+    def jitter_percentiles(self, percentiles=(50, 90, 99, 100)):
+        # Returns {percentile: jitter (s)} over the most recent ticks
+        if(self._jitter_len == 0):
+            return {p: 0.0 for p in percentiles}
+        values = sorted(self._jitter[:self._jitter_len])
+        last = len(values) - 1
+        return {p: values[min(last, round(p/100*last))] for p in percentiles}
+
+    def effective_rate(self):
+        if(self._start is None or self.ticks < 2):
+            return 0.0
+        elapsed = self.clock() - self._start
+        return self.ticks/elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        pct = self.jitter_percentiles()
+        return (f"ticks:{self.ticks} missed:{self.missed} late:{self.late} "
+                f"rate:{self.effective_rate():.1f}Hz "
+                f"jitter p50:{pct[50]*1000:.2f}ms p90:{pct[90]*1000:.2f}ms "
+                f"p99:{pct[99]*1000:.2f}ms max:{pct[100]*1000:.2f}ms")
@@ -0,0 +1,113 @@
+# Acceleration smoothing filters
+#
+# Every filter works on a whole (N, M) array along the sample axis (no Python loop per
+# sample) and returns a float array of the same shape; the input is not modified.
+#   "none":        no smoothing
+#   "neighbor":    average of the previous and next sample (the old average.average_acc),
+#                  first and last samples kept
+#   "moving":      centered moving average of width k (shorter window at the edges)
+#   "savgol":      Savitzky-Golay, least squares polynomial of 'order' over 'window' samples
+#   "butterworth": low-pass Butterworth run forward and backward (zero phase) with sosfiltfilt
+# Filters that need a sample rate take it from the sample times 't' if given (median
+# interval, the rate changes between flight phases) or from 'rate'.
+#
+# Arrays are in the compute dtype of the dtype policy (dtypes.py), running sums in its
+# accumulate dtype.  NumPy / SciPy are imported by the filters, not at import time.
+
+import dtypes
+
+SAMPLE_RATE = 100           # (Hz) default rate when no sample times are given
+
+
+def _array(data):
+    data = dtypes.as_float(data)
+    return data[:, None] if data.ndim == 1 else data
+
+
+def _rate(t, rate):
+    import numpy as np
+    if(t is None or len(t) < 2):
+        return rate
+    return 1/np.median(np.diff(t))
+
+
+def none(data):
+    return _array(data)
+
+
+def neighbor_average(data):
+    data = _array(data)
+    out = data.copy()
+    out[1:-1] = (data[:-2] + data[2:])/2
+    return out
+
+
+def moving_average(data, k=5):
+    '''
+    Centered moving average of width k (odd), from a running sum
+    '''
+    import numpy as np
+    if(k < 1 or k % 2 == 0):
+        raise ValueError("k must be a positive odd number")
+    data = _array(data)
+    n = len(data)
+    half = k//2
+    total = np.zeros((n + 1, data.shape[1]), dtype=dtypes.policy().accumulate)
+    np.cumsum(data, axis=0, out=total[1:])
+    index = np.arange(n)
+    lo = np.maximum(index - half, 0)
+    hi = np.minimum(index + half + 1, n)
+    return ((total[hi] - total[lo])/(hi - lo)[:, None]).astype(data.dtype, copy=False)
+
+
+def savgol(data, window=11, order=3):
+    '''
+    Savitzky-Golay filter; the window shrinks (odd, > order) for very short data
+    '''
+    from scipy.signal import savgol_filter
+    data = _array(data)
+    window = min(window, len(data) if len(data) % 2 else len(data) - 1)
+    if(window <= order):
+        return data.copy()
+    return savgol_filter(data, window, order, axis=0, mode="interp").astype(data.dtype, copy=False)
+
+
+def butterworth(data, cutoff=10.0, order=4, t=None, rate=SAMPLE_RATE):
+    '''
+    Zero-phase low-pass Butterworth filter
+    @param cutoff: (Hz) -3 dB frequency of each pass (below the Nyquist frequency)
+    @param t: sample times, used for the sample rate if given
+    @param rate: (Hz) sample rate when 't' is not given
+    '''
+    from scipy.signal import butter, sosfiltfilt
+    data = _array(data)
+    nyquist = _rate(t, rate)/2
+    if(not 0 < cutoff < nyquist):
+        raise ValueError(f"cutoff must be between 0 and the Nyquist frequency ({nyquist:.1f} Hz)")
+    sos = butter(order, cutoff/nyquist, output="sos")
+    padlen = min(3*(2*len(sos) + 1), len(data) - 1)
+    if(padlen < 1):
+        return data.copy()
+    return sosfiltfilt(sos.astype(data.dtype), data, axis=0, padlen=padlen).astype(data.dtype, copy=False)
+
+
+FILTERS = {
+    "none": none,
+    "neighbor": neighbor_average,
+    "moving": moving_average,
+    "savgol": savgol,
+    "butterworth": butterworth,
+}
+
+
+def smooth(data, method="neighbor", t=None, **options):
+    '''
+    Smooth (N, M) data with the filter named 'method' (see FILTERS)
+    @param t: sample times, passed to filters that need the sample rate
+    @param options: filter parameters (k, window, order, cutoff, rate)
+    '''
+    if(method not in FILTERS):
+        raise ValueError(f"unknown smoothing method {method!r}, one of {tuple(FILTERS)}")
+    if(method == "butterworth"):
+        options["t"] = t
+    return FILTERS[method](data, **options)
@@ -0,0 +1,153 @@
+# Non-blocking RF telemetry
+#
+# The sampling loops hand messages to Telemetry and return immediately; a worker thread
+# owns the RFM9x and sends at most 'rate' packets per second (token bucket), so LoRa
+# airtime never stalls IMU sampling.
+#   - event():  queued in order and always sent first (SETUP, LAUNCH, LANDED, KEY, ...)
+#   - data():   binary sample frames (frames.py), bounded, oldest dropped when full
+#   - status(): decimated (only every n-th call is kept) and latest-wins, so a slow
+#               radio drops stale status lines instead of building a backlog
+
+import collections
+import threading
+import time
+
+
+class Telemetry:
+
+    def __init__(self, radio, rate=4.0, status_decimation=25, burst=2, max_data=8, clock=time.monotonic, sleep=time.sleep):
+        '''
+        @param radio: object with send(bytes) (adafruit_rfm9x.RFM9x or a simulated radio)
+        @param rate: packet budget, in packets per second
+        @param status_decimation: keep one of every n status() calls
+        @param burst: number of packets that may be sent back to back after an idle period
+        @param max_data: number of data frames held before the oldest is dropped
+        @param clock: monotonic time source used for pacing
+        @param sleep: sleep function matching the clock
+        '''
+        self.radio = radio
+        self.rate = rate
+        self.status_decimation = status_decimation
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+
+        self.sent = 0               # Packets handed to the radio
+        self.send_errors = 0        # Packets whose send() raised
+        self.last_error = None      # Last exception raised by send()
+        self.status_skipped = 0     # Status messages dropped by decimation or replaced before sending
+        self.data_dropped = 0       # Data frames dropped because the radio fell behind
+        self.airtime_max = 0.0      # Longest single send() (s)
+
+        self._events = collections.deque()
+        self._data = collections.deque(maxlen=max_data)
+        self._status = None
+        self._status_calls = 0
+        self._busy = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+
+    def event(self, message, count=1):
+        # High priority message, repeated 'count' times (same as transmit_rf's count)
+        with self._cond:
+            for _ in range(count):
+                self._events.append(message)
+            self._cond.notify()
+
+    def data(self, frame):
+        # Medium priority binary frame, sent after pending events
+        with self._cond:
+            if(len(self._data) == self._data.maxlen):
+                self.data_dropped += 1
+            self._data.append(frame)
+            self._cond.notify()
+
+    def status(self, message):
+        # Low priority message; cheap to call every sample
+        self._status_calls += 1
+        if(self._status_calls % self.status_decimation != 1 and self.status_decimation > 1):
+            self.status_skipped += 1
+            return
+        with self._cond:
+            if(self._status is not None):
+                self.status_skipped += 1
+            self._status = message
+            self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return len(self._events) + len(self._data) + (self._status is not None)
+
+    def flush(self, timeout=None):
+        # Block until everything queued so far has been sent (returns False on timeout)
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending_locked() and not self._busy, timeout)
+
+    def close(self, timeout=None):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _pending_locked(self):
+        return self._events or self._data or self._status is not None
+
+    def _next(self):
+        # Called with the lock held
+        if(self._events):
+            return self._events.popleft()
+        if(self._data):
+            return self._data.popleft()
+        message, self._status = self._status, None
+        return message
+
+    def _run(self):
+        tokens = self.burst
+        last = self.clock()
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._pending_locked())
+                if(self._closed and not self._pending_locked()):
+                    return
+
+            # Pace to the packet budget (outside the lock so producers never wait)
+            now = self.clock()
+            tokens = min(self.burst, tokens + (now - last)*self.rate)
+            last = now
+            if(tokens < 1):
+                self.sleep((1 - tokens)/self.rate)
+                continue
+
+            with self._cond:
+                message = self._next()
+                if(message is None):
+                    continue
+                self._busy = True
+            tokens -= 1
+
+            # Any radio fault (RuntimeError from the driver, OSError from SPI, ...) is counted
+            # and the worker carries on; _busy is always cleared so flush() can return
+            start = self.clock()
+            try:
+                self.radio.send(bytes(message, "utf-8") if isinstance(message, str) else message)
+                self.sent += 1
+            except Exception as e:
+                self.send_errors += 1
+                self.last_error = e
+            finally:
+                elapsed = self.clock() - start
+                if(elapsed > self.airtime_max):
+                    self.airtime_max = elapsed
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def report(self):
+        text = (f"sent:{self.sent} errors:{self.send_errors} pending:{self.pending()} "
+                f"status_skipped:{self.status_skipped} data_dropped:{self.data_dropped} airtime_max:{self.airtime_max*1000:.1f}ms")
+        if(self.last_error is not None):
+            text += f" last_error:{self.last_error!r}"
+        return text